@@ -20,7 +20,7 @@ import os
 import json
 import logging
 from curator_agent import CuratorAgent
-from storyteller_agent import StorytellerAgent
+from storyteller_agent import get_storyteller
 from image_generator_agent import ImageGeneratorAgent
 from synthesizer_agent import ContentSynthesizer
 from pricing_agent import DynamicPricingAgent
@@ -52,7 +52,7 @@ class Orchestrator:
         self.curator_available = False
             
         try:
-            self.storyteller = StorytellerAgent()
+            self.storyteller = get_storyteller()
             logger.info("✅ Storyteller Agent initialized successfully")
         except Exception as e:
             logger.error(f"❌ Storyteller initialization failed: {str(e)}")
@@ -178,19 +178,21 @@ class Orchestrator:
             
             # 3. Synthesizer: Create marketing assets
             print("\n📱 Step 3: Creating marketing assets...")
+            prepared = self.synthesizer.prepare(validated_prompts)
             
             # Social post with storytelling image
             if story_image_paths:
                 social_post = self.synthesizer.create_story_post(
                     validated_prompts, 
                     story_image_paths[0],  # Use first storytelling image
-                    output_path=os.path.join(output_dir, "story_post.jpg")
+                    output_path=os.path.join(output_dir, "story_post.webp"),
+                    prepared=prepared
                 )
                 results["outputs"]["social_post"] = social_post
                 print(f"✅ Story-focused social post saved to {social_post}")
             
             # E-commerce content
-            ecommerce = self.synthesizer.create_ecommerce_content(validated_prompts)
+            ecommerce = self.synthesizer.create_ecommerce_content(validated_prompts, prepared=prepared)
             results["outputs"]["ecommerce"] = ecommerce
             print("✅ Story-focused e-commerce content formatted")
             
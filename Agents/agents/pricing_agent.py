@@ -2,14 +2,19 @@
 import logging
 import os
 from datetime import datetime, timedelta
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Tuple
 import vertexai
 from vertexai.preview.generative_models import GenerativeModel
+import google.auth
 import google.cloud.firestore
 import requests
 import time
 import re
 import json
+import threading
+from collections import OrderedDict
+import ahocorasick
+from concurrent.futures import ThreadPoolExecutor
 
 # Import Market Intelligence
 try:
@@ -20,6 +25,129 @@ except ImportError:
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Memoized component scores kept across agent instances (LRU)
+_SCORE_CACHE_SIZE = 512
+
+# Market scores fold in live Google Trends multipliers, so they expire
+_MARKET_SCORE_TTL_SECONDS = 3600
+
+# Upper bound on products priced concurrently by calculate_prices_batch
+_BATCH_MAX_WORKERS = 8
+
+# Application Default Credentials, resolved once per process and shared by every agent
+_CREDS = None
+_CREDS_PROJECT = None
+_CREDS_LOCK = threading.Lock()
+
+
+def _get_credentials():
+    """Return (credentials, project) from google.auth.default(), resolving them only on first use"""
+    global _CREDS, _CREDS_PROJECT
+    with _CREDS_LOCK:
+        if _CREDS is None:
+            _CREDS, _CREDS_PROJECT = google.auth.default()
+    return _CREDS, _CREDS_PROJECT
+
+
+def _build_matcher(groups: Dict[str, tuple]):
+    """
+    Aho-Corasick automaton over every keyword in groups (keywords must be lowercase)
+    Each keyword maps to the set of groups it belongs to, so one pass over a text
+    answers all of the "any keyword of this group in text" checks at once
+    """
+    keyword_groups = {}
+    for group, keywords in groups.items():
+        for keyword in keywords:
+            keyword_groups.setdefault(keyword, set()).add(group)
+    automaton = ahocorasick.Automaton()
+    for keyword, kw_groups in keyword_groups.items():
+        automaton.add_word(keyword, (keyword, frozenset(kw_groups)))
+    automaton.make_automaton()
+    return automaton
+
+
+def _matched_groups(automaton, text: str) -> set:
+    """Groups with at least one keyword occurring (as a substring) in text"""
+    groups = set()
+    for _end, (_keyword, kw_groups) in automaton.iter(text):
+        groups |= kw_groups
+    return groups
+
+
+def _matched_keywords(automaton, text: str) -> list:
+    """Distinct keywords occurring in text, in order of first occurrence"""
+    return list(dict.fromkeys(keyword for _end, (keyword, _groups) in automaton.iter(text)))
+
+
+# Heritage signals in the story text
+_HERITAGE_MATCHER = _build_matcher({
+    'religious': ("religious", "spiritual", "temple", "worship", "deity", "ganesha", "krishna", "durga", "diwali", "holi", "festival"),
+    'rare_technique': ("kutch pottery", "manjusha art", "kalamkari", "warli", "madhubani"),
+    'generational': ("generational", "traditional"),
+})
+
+# Advanced techniques; each distinct one found adds to the complexity score
+_ADVANCED_TECHNIQUE_MATCHER = _build_matcher({'technique': (
+    'hand_painted', 'hand painted', 'handpainted', 'hand-painted',
+    'embroidery', 'embroidered',
+    'filigree',
+    'inlay_work', 'inlay work', 'inlay',
+    'damascene',
+    'meenakari', 'minakari',
+    'zardozi', 'zardozi work',
+    'block print', 'block printing',
+    'tie dye', 'bandhani', 'tie-dye',
+    'kalamkari',
+    'warli', 'madhubani', 'pattachitra',
+    'peacock', 'lotus', 'geometric patterns',
+    'intricate', 'detailed', 'multi-layered'
+)})
+
+# Heuristic complexity indicators (fallback when Gemini is unavailable)
+_HEURISTIC_MATCHER = _build_matcher({
+    'hand_painted': ("hand-painted", "handpainted", "hand painted"),
+    'intricate': ("intricate", "detailed", "elaborate"),
+    'multi': ("multi-layered", "multi-colored", "multicolored"),
+    'motif': ("peacock", "lotus", "floral"),
+    'time': ("hours", "days", "weeks", "time-consuming"),
+})
+
+# Craft category keywords, in detection priority order
+_CATEGORY_KEYWORDS = {
+    'pottery': ('pot', 'pottery', 'clay', 'ceramic', 'terracotta'),
+    'embroidery': ('embroidery', 'embroidered', 'stitch', 'needlework', 'zardozi'),
+    'jewelry': ('jewelry', 'jewellery', 'necklace', 'earring', 'bangle'),
+    'textile': ('textile', 'fabric', 'cloth', 'saree', 'dupatta', 'weaving'),
+    'woodwork': ('wood', 'wooden', 'carving', 'carved'),
+    'metalwork': ('metal', 'brass', 'copper', 'silver', 'gold', 'filigree'),
+    'painting': ('painting', 'painted', 'warli', 'madhubani', 'pattachitra'),
+    'leather': ('leather', 'hide', 'skin'),
+}
+_CATEGORY_MATCHER = _build_matcher(_CATEGORY_KEYWORDS)
+
+# Seasonal demand keywords; Diwali items get a boost when checked close to the festival
+_SEASON_MATCHER = _build_matcher({
+    'high': ("diya", "diyas", "rangoli", "festival", "decorative", "diwali", "dhanteras", "karva chauth", "halloween", "christmas", "new year"),
+    'medium': ("wedding", "ceremony", "occasion"),
+})
+_DIWALI_MONTHS = frozenset({10, 11})
+_PRE_DIWALI_MONTHS = frozenset({9, 10})
+
+# Regions with known higher/lower demand
+_REGION_MATCHER = _build_matcher({
+    'high': ("jaipur", "kutch", "banaras", "puri", "mumbai", "delhi"),
+    'low': ("remote", "less known"),
+})
+
+# First number in a Gemini score response
+_PAT_NUMBER = re.compile(r'\d+\.?\d*')
+
+
+def _story_key(storyteller_output: Dict[str, Any]) -> str:
+    """Hashable, order-independent key for a storyteller output dict"""
+    return json.dumps(storyteller_output, sort_keys=True, ensure_ascii=False, default=str)
+
+
 class DynamicPricingAgent:
     """
     Calculates dynamic prices based on Heritage Value, Craft Complexity, and Market Demand.
@@ -27,10 +155,47 @@ class DynamicPricingAgent:
     Includes market price cache for validation.
     """
     
+    # (method, *input key) -> (expires_at, score), shared by all instances so repeated inputs skip Gemini and rescoring
+    _score_cache = OrderedDict()
+    _score_cache_lock = threading.Lock()
+    
+    @classmethod
+    def cache_clear(cls):
+        """Drop all memoized scores (e.g. between test cases)"""
+        with cls._score_cache_lock:
+            cls._score_cache.clear()
+    
+    def _memoized(self, key: tuple, compute, ttl: Optional[float] = None):
+        """
+        Return the cached score for key, computing it on a miss.
+        compute returns (score, cacheable); degraded scores (fallbacks after a
+        Gemini/Trends failure) are returned but not stored, so the next call retries.
+        """
+        cache = DynamicPricingAgent._score_cache
+        with DynamicPricingAgent._score_cache_lock:
+            entry = cache.get(key)
+            if entry is not None and (entry[0] is None or entry[0] > time.monotonic()):
+                cache.move_to_end(key)
+                return entry[1]
+            if entry is not None:
+                del cache[key]
+        
+        value, cacheable = compute()
+        
+        if cacheable:
+            expires_at = time.monotonic() + ttl if ttl is not None else None
+            with DynamicPricingAgent._score_cache_lock:
+                cache[key] = (expires_at, value)
+                cache.move_to_end(key)
+                if len(cache) > _SCORE_CACHE_SIZE:
+                    cache.popitem(last=False)
+        return value
+    
     def __init__(self):
         try:
-            # Initialize Firestore
-            self.db = google.cloud.firestore.Client()
+            # Initialize Firestore with the process-wide credentials
+            self._creds, creds_project = _get_credentials()
+            self.db = google.cloud.firestore.Client(credentials=self._creds, project=creds_project)
             self.collection = "cultural_knowledge_base"
             logger.info("✅ Firestore client initialized successfully for pricing")
         except Exception as e:
@@ -39,7 +204,7 @@ class DynamicPricingAgent:
         
         try:
             # Initialize Vertex AI with correct billing-enabled project
-            vertexai.init(project=os.getenv("GOOGLE_CLOUD_PROJECT", "nodal-fountain-470717-j1"), location="us-central1")
+            vertexai.init(project=os.getenv("GOOGLE_CLOUD_PROJECT", "nodal-fountain-470717-j1"), location="us-central1", credentials=self._creds)
             self.model = GenerativeModel("gemini-2.0-flash")
             logger.info("✅ Vertex AI initialized successfully for pricing")
         except Exception as e:
@@ -127,6 +292,8 @@ class DynamicPricingAgent:
     def calculate_price(self, product_description: str, storyteller_output: Dict[str, Any], material_cost: Optional[float] = 0.0) -> Dict[str, Any]:
         """
         Calculates a dynamic price based on input factors.
+        The component scores are memoized in the shared score cache (see cache_clear);
+        the price itself is recomputed on every call.
 
         Args:
             product_description: The artisan's description of the product.
@@ -136,6 +303,27 @@ class DynamicPricingAgent:
         Returns:
             A dictionary containing the price suggestion, range, justification, and probability estimate.
         """
+        return self._compute_price(product_description, storyteller_output, material_cost)
+    
+    def calculate_prices_batch(self, inputs: List[tuple]) -> List[Dict[str, Any]]:
+        """
+        Prices several products concurrently.
+        Each product's Gemini/Firestore/Trends calls are I/O-bound, so the batch
+        takes roughly as long as its slowest product instead of the sum.
+
+        Args:
+            inputs: (product_description, storyteller_output[, material_cost]) tuples.
+
+        Returns:
+            The calculate_price results, in input order.
+        """
+        if not inputs:
+            return []
+        with ThreadPoolExecutor(max_workers=min(len(inputs), _BATCH_MAX_WORKERS)) as executor:
+            return list(executor.map(lambda args: self.calculate_price(*args), inputs))
+    
+    def _compute_price(self, product_description: str, storyteller_output: Dict[str, Any], material_cost: Optional[float] = 0.0) -> Dict[str, Any]:
+        """Body of calculate_price"""
         logger.info("=" * 60)
         logger.info("🎯 Starting Dynamic Pricing Calculation")
         logger.info("=" * 60)
@@ -147,15 +335,19 @@ class DynamicPricingAgent:
         logger.info("📊 COMPONENT ANALYSIS")
         logger.info("=" * 60)
         
-        heritage_score = self._analyze_heritage_value(storyteller_output)
-        logger.info(f"🏛️ Heritage Score: {heritage_score}/10")
+        # The three analyses are independent (Gemini / Trends I/O), so run them concurrently
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            heritage_future = executor.submit(self._analyze_heritage_value, storyteller_output)
+            # --- 2. Analyze Craft Complexity ---
+            complexity_future = executor.submit(self._analyze_complexity, product_description, storyteller_output)
+            # --- 3. Analyze Market Demand ---
+            market_future = executor.submit(self._analyze_market_demand, product_description, storyteller_output)
+        heritage_score = heritage_future.result()
+        complexity_score = complexity_future.result()
+        market_score = market_future.result()
         
-        # --- 2. Analyze Craft Complexity ---
-        complexity_score = self._analyze_complexity(product_description, storyteller_output)
+        logger.info(f"🏛️ Heritage Score: {heritage_score}/10")
         logger.info(f"🎨 Complexity Score: {complexity_score}/10")
-        
-        # --- 3. Analyze Market Demand ---
-        market_score = self._analyze_market_demand(product_description, storyteller_output)
         logger.info(f"📈 Market Score: {market_score}/10")
         
         # --- 4. Combine Scores (Weighted Average) ---
@@ -269,22 +461,27 @@ class DynamicPricingAgent:
         Analyzes heritage value based on storyteller output.
         Returns a score between 0 and 10.
         """
+        key = ("heritage", _story_key(storyteller_output))
+        return self._memoized(key, lambda: self._compute_heritage_value(storyteller_output))
+    
+    def _compute_heritage_value(self, storyteller_output: Dict[str, Any]) -> Tuple[float, bool]:
+        """Uncached body of _analyze_heritage_value; returns (score, cacheable)"""
         # Check for religious/cultural significance
         cultural_elements = storyteller_output.get("cultural_elements", [])
         story_text = " ".join(storyteller_output.get("image_prompts", [])) + " " + storyteller_output.get("story_title", "")
         story_text_lower = story_text.lower()
         
         score = 0.0
+        # One scan of the story text for all heritage keyword groups
+        found = _matched_groups(_HERITAGE_MATCHER, story_text_lower)
         
         # Check for religious/cultural significance keywords
-        religious_keywords = ["religious", "spiritual", "temple", "worship", "deity", "ganesha", "krishna", "durga", "diwali", "holi", "festival"]
-        if any(keyword in story_text_lower for keyword in religious_keywords):
+        if 'religious' in found:
             score += 3.0
         
         # Check for endangered/rare techniques (requires knowledge base lookup)
         # This is a simplified check - could be enhanced with Firestore lookup
-        rare_techniques = ["kutch pottery", "manjusha art", "kalamkari", "warli", "madhubani"]
-        if any(technique.lower() in story_text_lower for technique in rare_techniques):
+        if 'rare_technique' in found:
             score += 4.0
         
         # Check for regional significance
@@ -293,16 +490,24 @@ class DynamicPricingAgent:
             score += 2.0
         
         # Check for "generational" and "traditional" in story
-        if "generational" in story_text_lower or "traditional" in story_text_lower:
+        if 'generational' in found:
             score += 1.0
         
-        return min(10.0, score)
+        return min(10.0, score), True
 
     def _analyze_complexity(self, product_description: str, storyteller_output: Dict[str, Any]) -> float:
         """
         Analyzes craft complexity based on description and story using Gemini AI.
         Returns a score between 0 and 10.
         """
+        key = ("complexity", product_description, _story_key(storyteller_output))
+        return self._memoized(key, lambda: self._compute_complexity(product_description, storyteller_output))
+    
+    def _compute_complexity(self, product_description: str, storyteller_output: Dict[str, Any]) -> Tuple[float, bool]:
+        """
+        Uncached body of _analyze_complexity (calls Gemini); returns (score, cacheable).
+        Heuristic fallbacks are not cacheable.
+        """
         try:
             # Combine description and image prompts for comprehensive analysis
             image_prompts = storyteller_output.get("image_prompts", [])
@@ -351,9 +556,9 @@ Example: 7.5"""
             logger.info(f"📝 Gemini response: {response_text}")
             
             # Try to extract number from response
-            import re
-            numbers = re.findall(r'\d+\.?\d*', response_text)
+            numbers = _PAT_NUMBER.findall(response_text)
             
+            ai_scored = bool(numbers)
             if numbers:
                 base_score = float(numbers[0])
                 # Ensure score is within range
@@ -364,48 +569,27 @@ Example: 7.5"""
                 base_score = self._heuristic_complexity_analysis(product_description, storyteller_output)
             
             # Check for advanced techniques (case-insensitive)
-            advanced_techniques = [
-                'hand_painted', 'hand painted', 'handpainted', 'hand-painted',
-                'embroidery', 'embroidered',
-                'filigree',
-                'inlay_work', 'inlay work', 'inlay',
-                'damascene',
-                'meenakari', 'minakari',
-                'zardozi', 'zardozi work',
-                'block print', 'block printing',
-                'tie dye', 'bandhani', 'tie-dye',
-                'kalamkari',
-                'warli', 'madhubani', 'pattachitra',
-                'peacock', 'lotus', 'geometric patterns',
-                'intricate', 'detailed', 'multi-layered'
-            ]
-            
             # Convert to lowercase for comparison
             desc_lower = product_description.lower()
             cultural_elements = [elem.lower() for elem in storyteller_output.get("cultural_elements", [])]
             story_text = ' '.join(image_prompts).lower()
             full_text = desc_lower + ' ' + story_text + ' ' + ' '.join(cultural_elements)
             
-            technique_bonus = 0
-            found_techniques = []
-            
-            for technique in advanced_techniques:
-                if technique in full_text:
-                    technique_bonus += 0.5  # +0.5 per technique
-                    found_techniques.append(technique)
+            found_techniques = _matched_keywords(_ADVANCED_TECHNIQUE_MATCHER, full_text)
+            technique_bonus = 0.5 * len(found_techniques)  # +0.5 per technique
             
             # Cap technique bonus at +3 points
             technique_bonus = min(3.0, technique_bonus)
             
             if found_techniques:
-                logger.info(f"🎯 Found advanced techniques: {', '.join(set(found_techniques))}")
+                logger.info(f"🎯 Found advanced techniques: {', '.join(found_techniques)}")
                 logger.info(f"💫 Technique bonus: +{technique_bonus}")
             
             # Calculate final score with bonus (cap at 10)
             final_score = min(10.0, base_score + technique_bonus)
             
             logger.info(f"✅ Final complexity score: {final_score}/10")
-            return final_score
+            return final_score, ai_scored
             
         except Exception as e:
             logger.error(f"❌ Complexity analysis failed: {str(e)}")
@@ -413,22 +597,22 @@ Example: 7.5"""
             logger.error(traceback.format_exc())
             # Fall back to heuristic analysis
             logger.info("⚠️ Using heuristic complexity analysis as fallback")
-            return self._heuristic_complexity_analysis(product_description, storyteller_output)
+            return self._heuristic_complexity_analysis(product_description, storyteller_output), False
     
     def _heuristic_complexity_analysis(self, product_description: str, storyteller_output: Dict[str, Any]) -> float:
         """Fallback heuristic-based complexity analysis when AI fails"""
         score = 5.0  # Start with medium complexity
         
-        desc_lower = product_description.lower()
+        desc_found = _matched_groups(_HEURISTIC_MATCHER, product_description.lower())
         
         # Check for complexity indicators
-        if any(word in desc_lower for word in ["hand-painted", "handpainted", "hand painted"]):
+        if 'hand_painted' in desc_found:
             score += 1.5
-        if any(word in desc_lower for word in ["intricate", "detailed", "elaborate"]):
+        if 'intricate' in desc_found:
             score += 1.0
-        if any(word in desc_lower for word in ["multi-layered", "multi-colored", "multicolored"]):
+        if 'multi' in desc_found:
             score += 1.0
-        if any(word in desc_lower for word in ["peacock", "lotus", "floral"]):
+        if 'motif' in desc_found:
             score += 1.0
         
         # Check cultural elements
@@ -438,7 +622,7 @@ Example: 7.5"""
         
         # Check story for time investment
         story_text = " ".join(storyteller_output.get("image_prompts", [])).lower()
-        if any(word in story_text for word in ["hours", "days", "weeks", "time-consuming"]):
+        if 'time' in _matched_groups(_HEURISTIC_MATCHER, story_text):
             score += 1.0
         
         return min(10.0, max(1.0, score))
@@ -448,6 +632,19 @@ Example: 7.5"""
         Analyzes market demand using Google Trends data and regional factors.
         Returns a score between 0 and 10.
         """
+        # Seasonal multipliers depend on the month and the scoring path on whether
+        # Market Intelligence is available, so both are part of the key;
+        # Trends multipliers change underneath it, hence the TTL
+        key = ("market", product_description, _story_key(storyteller_output), datetime.now().month,
+               self.market_intel is not None)
+        return self._memoized(key, lambda: self._compute_market_demand(product_description, storyteller_output),
+                              ttl=_MARKET_SCORE_TTL_SECONDS)
+    
+    def _compute_market_demand(self, product_description: str, storyteller_output: Dict[str, Any]) -> Tuple[float, bool]:
+        """
+        Uncached body of _analyze_market_demand; returns (score, cacheable).
+        A score computed without the Trends multipliers after a failure is not cacheable.
+        """
         logger.info("\n🔍 Analyzing Market Demand...")
         
         # Start with base regional score
@@ -473,6 +670,7 @@ Example: 7.5"""
                 break
         
         # Apply Google Trends multiplier if available
+        cacheable = True
         if self.market_intel:
             try:
                 # Detect category from description
@@ -492,6 +690,7 @@ Example: 7.5"""
                 
             except Exception as e:
                 logger.warning(f"⚠️ Could not apply trend multipliers: {e}")
+                cacheable = False
         else:
             # Fallback to manual seasonal logic
             current_month = datetime.now().month
@@ -511,7 +710,7 @@ Example: 7.5"""
         final_score = min(10.0, base_score)
         logger.info(f"✅ Final Market Demand Score: {final_score}/10")
         
-        return final_score
+        return final_score, cacheable
 
     def _get_trend_score(self, product_description: str, storyteller_output: Dict[str, Any]) -> float:
         """
@@ -536,14 +735,11 @@ Example: 7.5"""
         Returns a normalized score contribution (e.g., -1 to +1).
         """
         region = storyteller_output.get("overview", {}).get("region", "").lower()
+        found = _matched_groups(_REGION_MATCHER, region)
         
-        # Example regions with potentially higher/lower demand
-        high_demand_regions = ["jaipur", "kutch", "banaras", "puri", "mumbai", "delhi"]
-        low_demand_regions = ["remote", "less known"]
-        
-        if any(r in region for r in high_demand_regions):
+        if 'high' in found:
             return 0.5  # Small positive boost
-        elif any(r in region for r in low_demand_regions):
+        elif 'low' in found:
             return -0.5  # Small negative adjustment
         else:
             return 0.0  # Neutral
@@ -556,25 +752,21 @@ Example: 7.5"""
         desc_lower = product_description.lower()
         story_text_lower = " ".join(storyteller_output.get("image_prompts", [])) + " " + storyteller_output.get("story_title", "").lower()
         
-        # Check for seasonal keywords
-        high_season_keywords = ["diya", "diyas", "rangoli", "festival", "decorative", "diwali", "dhanteras", "karva chauth", "halloween", "christmas", "new year"]
-        medium_season_keywords = ["wedding", "ceremony", "occasion"]
+        # Check for seasonal keywords (each text scanned separately, as before)
+        found = _matched_groups(_SEASON_MATCHER, desc_lower) | _matched_groups(_SEASON_MATCHER, story_text_lower)
         
-        found_high_season = any(kw in desc_lower or kw in story_text_lower for kw in high_season_keywords)
-        found_medium_season = any(kw in desc_lower or kw in story_text_lower for kw in medium_season_keywords)
-        
-        if found_high_season:
+        if 'high' in found:
             # Check if currently in season (simplified)
             current_month = datetime.now().month
             if "diwali" in desc_lower or "diya" in desc_lower:
-                if current_month in [10, 11]:
+                if current_month in _DIWALI_MONTHS:
                     return 2.0  # High boost if in season
-                elif current_month in [9, 10]:
+                elif current_month in _PRE_DIWALI_MONTHS:
                     return 1.0  # Slight boost earlier
                 else:
                     return -0.5  # Slight penalty if off-season
             return 1.5  # Default high season boost
-        elif found_medium_season:
+        elif 'medium' in found:
             return 1.0  # Medium boost
         else:
             return 0.0  # Neutral
@@ -627,25 +819,9 @@ Example: 7.5"""
         cultural_elements = ' '.join(storyteller_output.get("cultural_elements", [])).lower()
         combined_text = desc_lower + ' ' + cultural_elements
         
-        # Check for category keywords
-        if any(word in combined_text for word in ['pot', 'pottery', 'clay', 'ceramic', 'terracotta']):
-            return 'pottery'
-        elif any(word in combined_text for word in ['embroidery', 'embroidered', 'stitch', 'needlework', 'zardozi']):
-            return 'embroidery'
-        elif any(word in combined_text for word in ['jewelry', 'jewellery', 'necklace', 'earring', 'bangle']):
-            return 'jewelry'
-        elif any(word in combined_text for word in ['textile', 'fabric', 'cloth', 'saree', 'dupatta', 'weaving']):
-            return 'textile'
-        elif any(word in combined_text for word in ['wood', 'wooden', 'carving', 'carved']):
-            return 'woodwork'
-        elif any(word in combined_text for word in ['metal', 'brass', 'copper', 'silver', 'gold', 'filigree']):
-            return 'metalwork'
-        elif any(word in combined_text for word in ['painting', 'painted', 'warli', 'madhubani', 'pattachitra']):
-            return 'painting'
-        elif any(word in combined_text for word in ['leather', 'hide', 'skin']):
-            return 'leather'
-        else:
-            return 'pottery'  # Default category
+        # Check for category keywords in one scan, then take the first category by priority
+        found = _matched_groups(_CATEGORY_MATCHER, combined_text)
+        return next((category for category in _CATEGORY_KEYWORDS if category in found), 'pottery')  # Default category
     
     def _validate_with_market_cache(self, suggested_price: float, product_description: str, storyteller_output: Dict[str, Any]) -> Dict[str, Any]:
         """Validate AI-suggested price against market cache data"""
@@ -3,21 +3,385 @@
 📖 The Storyteller Agent (Complete Storytelling Package)
 - Generates narrative story text for social media sharing
 - Creates visual prompts specifically for image generation
-- Robust JSON parsing handles all LLM response formats
+- Schema-constrained JSON output parsed with a strict fallback
 - Creates complete storytelling package based on artisan description
 """
 
 import re
+import copy
+import hashlib
+import io
+import asyncio
 import json
+import os
+import time
 import logging
-from google.cloud import firestore
-from vertexai.preview.generative_models import GenerativeModel
+import threading
+from collections import OrderedDict
+import ahocorasick
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import diskcache
+except ImportError:  # Optional local response cache
+    diskcache = None
+
+# google.cloud.firestore and vertexai are imported where the clients are built:
+# both pull large dependency graphs, so importing this module stays cheap
 
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Fields every storytelling package must contain
+_REQUIRED_FIELDS = frozenset({
+    "story_title", "story_text", "emotional_theme",
+    "image_prompts", "cultural_elements", "recommended_hashtags"
+})
+
+# Quality checklists used by validate_prompts (substring probes on lowercased text)
+_VISUAL_ELEMENTS = frozenset({"lighting", "composition", "angle", "mood", "texture", "color"})
+_INDIAN_ELEMENTS = frozenset({
+    "india", "indian", "jaipur", "kutch", "rajasthan", "gujarat",
+    "shilp", "kala", "karuna", "quartz", "cobalt", "handmade"
+})
+_STORY_CULTURAL_ELEMENTS = frozenset({"india", "indian", "heritage", "tradition", "artisan", "craft"})
+
+# Package fields that must be non-empty strings / non-empty lists of strings
+_TEXT_FIELDS = ("story_title", "story_text", "emotional_theme")
+_LIST_FIELDS = ("image_prompts", "cultural_elements", "recommended_hashtags")
+
+_MODEL_NAME = "gemini-2.5-flash"
+
+# Static storyteller instructions, sent as the system instruction so the
+# per-request prompt only carries the retrieved context
+_STORYTELLER_INSTRUCTIONS = """
+You are a cultural storyteller for Indian artisans. Create storytelling content with image prompts.
+
+Create:
+1. Story Title (5-10 words)
+2. Story Text (150-200 words) - ONE continuous line, no line breaks
+3. Emotional Theme (one word: heritage/pride/tradition/craftsmanship/legacy)
+4. Three Image Prompts (80-100 words each) - ONE line each, describe specific visual scenes
+5. Three Cultural Elements (key cultural aspects)
+6. Three Hashtags (relevant social media tags)
+
+Return ONLY this JSON format:
+{
+  "story_title": "Title here",
+  "story_text": "Complete story in one line",
+  "emotional_theme": "Theme",
+  "image_prompts": [
+    "First visual scene with lighting and composition details",
+    "Second visual scene with mood and cultural elements",
+    "Third visual scene with artisan focus and authenticity"
+  ],
+  "cultural_elements": ["element1", "element2", "element3"],
+  "recommended_hashtags": ["hashtag1", "hashtag2", "hashtag3"]
+}
+
+RULES: No line breaks in strings. Write everything in single lines. Valid JSON only.
+"""
+
+# Structured-output schema for the storytelling package
+_RESPONSE_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "story_title": {"type": "STRING"},
+        "story_text": {"type": "STRING"},
+        "emotional_theme": {"type": "STRING"},
+        "image_prompts": {"type": "ARRAY", "items": {"type": "STRING"}},
+        "cultural_elements": {"type": "ARRAY", "items": {"type": "STRING"}},
+        "recommended_hashtags": {"type": "ARRAY", "items": {"type": "STRING"}}
+    },
+    "required": [
+        "story_title", "story_text", "emotional_theme",
+        "image_prompts", "cultural_elements", "recommended_hashtags"
+    ]
+}
+
+# Output token ceilings: most packages fit the default, truncated ones retry once
+# (Gemini 2.5 Flash counts thinking tokens against this limit, so keep headroom)
+_DEFAULT_MAX_OUTPUT_TOKENS = 2048
+_RETRY_MAX_OUTPUT_TOKENS = 4096
+
+# How long the in-memory keyword index is trusted before re-reading Firestore
+_KEYWORD_INDEX_TTL_SECONDS = 600
+
+# Retrieved contexts kept per normalized description
+_CONTEXT_CACHE_SIZE = 512
+
+# Semantic cache: cosine similarity above which a cached package is reused
+_SEMANTIC_CACHE_THRESHOLD = 0.92
+_SEMANTIC_CACHE_COLLECTION = "storyteller_cache"
+# Most recent entries loaded and kept in memory (the collection itself is unbounded)
+_SEMANTIC_CACHE_MAX_ENTRIES = 2000
+_EMBEDDING_MODEL_NAME = "text-embedding-004"
+
+# Exact-match cache keyed by a content hash of the description; bump the
+# version whenever the prompt or response schema changes (v2: only validated
+# packages are stored, so v1 entries may hold incomplete ones)
+_EXACT_CACHE_COLLECTION = "storyteller_exact_cache"
+_EXACT_CACHE_VERSION = "v2"
+
+# Local on-disk tier in front of the exact-match cache (needs diskcache):
+# repeat runs on the same machine skip the Firestore round-trip too
+_DISK_CACHE_DIR = os.environ.get("STORYTELLER_CACHE_DIR", ".storyteller_cache")
+_DISK_CACHE_TTL_SECONDS = 86400
+
+# Heuristic JSON repair for malformed free-text responses; not needed with
+# schema-constrained output, kept behind a flag for emergencies
+_LEGACY_JSON_REPAIR = os.environ.get("STORYTELLER_LEGACY_JSON_REPAIR", "").lower() in ("1", "true", "yes")
+
+# Precompiled patterns for _extract_json
+_PAT_JSON_FENCE = re.compile(r'```json\s*')
+_PAT_FENCE_END = re.compile(r'\s*```')
+_PAT_TRAIL_OBJ = re.compile(r',\s*}')
+_PAT_TRAIL_ARR = re.compile(r',\s*]')
+_PAT_OBJ = re.compile(r'(\{[\s\S]*\})')
+_PAT_ALL_FIELDS = re.compile(
+    r'"(?P<field>story_title|emotional_theme|story_text)"\s*:\s*"(?P<val>(?:[^"\\]|\\.)*)"',
+    re.DOTALL | re.IGNORECASE
+)
+# The array body is matched as a sequence of string literals, so a ']' inside a
+# prompt does not end it; an array still being streamed does not match at all
+_PAT_ALL_ARRAYS = re.compile(
+    r'"(?P<field>image_prompts|cultural_elements|recommended_hashtags)"\s*:\s*'
+    r'\[(?P<val>\s*(?:"(?:[^"\\]|\\.)*"\s*(?:,\s*"(?:[^"\\]|\\.)*"\s*)*(?:,\s*)?)?)\]',
+    re.DOTALL | re.IGNORECASE
+)
+_PAT_STORY_LOOSE = re.compile(r'"story_text"\s*:\s*"([^"]*(?:"[^"]*)*)"', re.IGNORECASE)
+_PAT_STR_ITEM = re.compile(r'"((?:[^"\\]|\\.)*)"')
+
+
+def _escape_newlines_in_strings(json_str: str) -> str:
+    """
+    Escape literal newlines inside JSON string values in one pass
+    Tracks whether the scanner is inside a double-quoted string (honouring
+    backslash escapes) and rewrites \n / \r there; structure outside strings is untouched
+    """
+    chunks = []
+    in_string = False
+    escaped = False
+    
+    for ch in json_str:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == '\\':
+                escaped = True
+            elif ch == '"':
+                in_string = False
+            elif ch == '\n':
+                ch = '\\n'
+            elif ch == '\r':
+                ch = '\\r'
+        elif ch == '"':
+            in_string = True
+        chunks.append(ch)
+    
+    return ''.join(chunks)
+
+
+def _extract_complete_fields(partial_text: str) -> dict:
+    """
+    Pull every field that is already complete out of a partially streamed JSON response
+    A string field counts once its closing quote has arrived, an array once its closing bracket has
+    """
+    fields = {}
+    for match in _PAT_ALL_FIELDS.finditer(partial_text):
+        fields.setdefault(match.group('field').lower(), _decode_json_string(match.group('val')))
+    for match in _PAT_ALL_ARRAYS.finditer(partial_text):
+        fields.setdefault(
+            match.group('field').lower(),
+            [_decode_json_string(item) for item in _PAT_STR_ITEM.findall(match.group('val'))]
+        )
+    return fields
+
+
+def _is_cacheable_package(package) -> bool:
+    """
+    Check a generated package is complete enough to serve again from a cache:
+    every required field present, text fields non-empty, list fields non-empty lists of strings
+    """
+    if not isinstance(package, dict) or _REQUIRED_FIELDS - package.keys():
+        return False
+    for field in _TEXT_FIELDS:
+        value = package[field]
+        if not isinstance(value, str) or not value.strip():
+            return False
+    for field in _LIST_FIELDS:
+        value = package[field]
+        if not isinstance(value, list) or not value or not all(isinstance(item, str) for item in value):
+            return False
+    return True
+
+
+def _decode_json_string(raw: str) -> str:
+    """Decode the escapes of a raw JSON string body, keeping it as-is if malformed"""
+    try:
+        return json.loads(f'"{raw}"')
+    except json.JSONDecodeError:
+        return raw
+
+
+def _top_k_positions(scores: np.ndarray, k: int) -> list:
+    """Positions of the k highest non-zero scores, highest first; ties keep collection order"""
+    candidates = np.flatnonzero(scores)
+    order = np.argsort(-scores[candidates], kind='stable')[:k]
+    return candidates[order].tolist()
+
+
+# Knowledge base fields rendered into the RAG context, in order: (key, label, join_list)
+_CONTEXT_FIELDS = (
+    ('art_form', 'Art Form', False),
+    ('region', 'Region', False),
+    ('cultural_significance', 'Cultural Significance', False),
+    ('historical_context', 'Historical Context', False),
+    ('technique', 'Technique', False),
+    ('traditional_motifs', 'Traditional Motifs', True),
+    ('materials', 'Materials', True),
+    ('colors', 'Color Palette', True),
+    ('visual_characteristics', 'Visual Characteristics', False),
+    ('famous_artisans', 'Famous Artisans', False),
+    ('famous_centers', 'Famous Centers', True),
+    ('story_elements', 'Story Elements', True),
+    ('common_uses', 'Common Uses', True),
+    ('philosophy', 'Philosophy', False),
+    ('example_description', 'Visual Example', False),
+)
+
+# Either/or fields: used only when the primary key is empty
+_CONTEXT_FIELD_FALLBACKS = {
+    'art_form': ('artifact_type', 'Artifact Type', False),
+    'technique': ('techniques', 'Techniques', True),
+}
+
+
+def _format_context(data: dict) -> str:
+    """Render a knowledge base document as labelled context lines"""
+    context_parts = []
+    for key, label, join_list in _CONTEXT_FIELDS:
+        value = data.get(key)
+        if not value and key in _CONTEXT_FIELD_FALLBACKS:
+            key, label, join_list = _CONTEXT_FIELD_FALLBACKS[key]
+            value = data.get(key)
+        if not value:
+            continue
+        if join_list and isinstance(value, list):
+            value = ', '.join(value)
+        context_parts.append(f"{label}: {value}")
+    return '\n'.join(context_parts)
+
+
+class SemanticCache:
+    """
+    Semantic response cache for storytelling packages
+    Paraphrased artisan descriptions map to nearby embeddings, so a cached
+    package is reused when cosine similarity clears the threshold.
+    Entries are kept in memory as a stacked unit-vector matrix and persisted to Firestore.
+    """
+    
+    def __init__(self, db, collection: str = _SEMANTIC_CACHE_COLLECTION,
+                 threshold: float = _SEMANTIC_CACHE_THRESHOLD,
+                 max_entries: int = _SEMANTIC_CACHE_MAX_ENTRIES):
+        self.db = db
+        self.collection = collection
+        self.threshold = threshold
+        self.max_entries = max_entries
+        from vertexai.language_models import TextEmbeddingModel
+        
+        self.embedding_model = TextEmbeddingModel.from_pretrained(_EMBEDDING_MODEL_NAME)
+        self._lock = threading.Lock()
+        self._embeddings = None   # np.ndarray (n_entries, dim), rows are unit length
+        self._responses = []
+        self._load()
+    
+    def _load(self):
+        """Load the most recent persisted entries (up to max_entries) into the in-memory matrix"""
+        from google.cloud import firestore
+        
+        query = (self.db.collection(self.collection)
+                 .order_by('created_at', direction=firestore.Query.DESCENDING)
+                 .limit(self.max_entries))
+        vectors = []
+        for doc in query.stream():
+            data = doc.to_dict() or {}
+            # Entries written before packages were validated may be incomplete
+            if data.get('embedding') and _is_cacheable_package(data.get('response')):
+                vectors.append(np.asarray(data['embedding'], dtype=np.float32))
+                self._responses.append(data['response'])
+        if vectors:
+            # Oldest first, so add() evicts from the front
+            vectors.reverse()
+            self._responses.reverse()
+            self._embeddings = np.vstack(vectors)
+        logger.info(f"🧠 Semantic cache loaded with {len(self._responses)} entries")
+    
+    def embed(self, text: str) -> np.ndarray:
+        """Embed text and normalize it to unit length"""
+        values = self.embedding_model.get_embeddings([text])[0].values
+        vector = np.asarray(values, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+    
+    def lookup(self, embedding: np.ndarray):
+        """Return a copy of the closest cached package, or None below the threshold"""
+        with self._lock:
+            if self._embeddings is None:
+                return None
+            similarities = self._embeddings @ embedding
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                return None
+            logger.info("⚡ Semantic cache hit (similarity: %.3f)", similarities[best])
+            return copy.deepcopy(self._responses[best])
+    
+    def add(self, embedding: np.ndarray, description: str, response: dict):
+        """Store a freshly generated package in memory and persist it"""
+        from google.cloud import firestore
+        
+        response = copy.deepcopy(response)
+        with self._lock:
+            if self._embeddings is None:
+                self._embeddings = embedding[np.newaxis, :]
+            else:
+                self._embeddings = np.vstack([self._embeddings, embedding])
+            self._responses.append(response)
+            if len(self._responses) > self.max_entries:
+                overflow = len(self._responses) - self.max_entries
+                self._embeddings = self._embeddings[overflow:]
+                del self._responses[:overflow]
+        
+        try:
+            self.db.collection(self.collection).add({
+                'description': description,
+                'embedding': embedding.tolist(),
+                'response': response,
+                'created_at': firestore.SERVER_TIMESTAMP
+            })
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to persist semantic cache entry: {str(e)}")
+
+
+_semantic_cache_instance = None
+_semantic_cache_lock = threading.Lock()
+
+
+def _get_semantic_cache(db) -> SemanticCache:
+    """
+    Return the process-wide SemanticCache, loading it on first use
+    The load streams Firestore and the embedding model, so agents share one instance
+    """
+    global _semantic_cache_instance
+    if _semantic_cache_instance is None:
+        with _semantic_cache_lock:
+            if _semantic_cache_instance is None:
+                _semantic_cache_instance = SemanticCache(db)
+    return _semantic_cache_instance
+
 
 class StorytellerAgent:
     """
@@ -32,157 +396,238 @@ class StorytellerAgent:
     """
     
     def __init__(self):
+        # Firestore and Vertex AI handshakes are independent: run them concurrently
+        # so cold start costs max(firestore, vertex) instead of their sum
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            db_future = executor.submit(self._init_firestore)
+            model_future = executor.submit(self._init_model)
+            self.db = db_future.result()
+            self.model = model_future.result()
+        self.collection = "cultural_knowledge_base"
+        
+        try:
+            self.semantic_cache = _get_semantic_cache(self.db)
+        except Exception as e:
+            # The cache is an optimization; generation still works without it
+            logger.warning(f"⚠️ Semantic cache unavailable: {str(e)}")
+            self.semantic_cache = None
+        
+        self.disk_cache = self._init_disk_cache()
+        
+        # In-memory inverted keyword index over cultural_knowledge_base
+        self._index_lock = threading.Lock()
+        self._index = {}          # keyword (lowercase) -> [doc_id, ...]
+        self._postings = {}       # keyword (lowercase) -> np.ndarray of document positions
+        self._doc_ids = []        # document position -> doc_id
+        self._automaton = None    # Aho-Corasick matcher over the index keywords
+        self._keywords_preview_str = ""     # first 50 keywords, for miss logging
+        self._keywords_preview_short = ""   # first 20 keywords, for the fallback context
+        self._doc_cache = {}      # doc_id -> document dict
+        self._index_loaded_at = 0.0
+        self._context_cache = OrderedDict()   # normalized description -> context string
+        self._load_keyword_index()
+    
+    @staticmethod
+    def _init_disk_cache():
+        if diskcache is None:
+            return None
+        try:
+            return diskcache.Cache(_DISK_CACHE_DIR)
+        except Exception as e:
+            logger.warning(f"⚠️ Disk cache unavailable: {str(e)}")
+            return None
+    
+    @staticmethod
+    def _init_firestore():
         try:
             # Initialize Firestore
-            self.db = firestore.Client()
-            self.collection = "cultural_knowledge_base"
+            from google.cloud import firestore
+            
+            db = firestore.Client()
             logger.info("✅ Firestore client initialized successfully")
+            return db
         except Exception as e:
             logger.error(f"❌ Firestore initialization failed: {str(e)}")
             raise
+    
+    @staticmethod
+    def _init_model():
+        from vertexai.preview.generative_models import GenerativeModel
         
         try:
             # Initialize Vertex AI with CORRECT model name (per knowledge base)
             # Using auto-updated alias as recommended
-            self.model = GenerativeModel("gemini-2.5-flash")
+            model = GenerativeModel(_MODEL_NAME, system_instruction=_STORYTELLER_INSTRUCTIONS)
             logger.info("✅ Gemini 2.5 Flash (auto-updated alias) loaded successfully")
+            return model
         except Exception as e:
             logger.error(f"❌ Vertex AI initialization failed: {str(e)}")
             # Fallback to specific version
             try:
-                self.model = GenerativeModel("gemini-2.5-flash")
+                model = GenerativeModel(_MODEL_NAME, system_instruction=_STORYTELLER_INSTRUCTIONS)
                 logger.info("✅ Gemini 2.5 Flash (specific version) loaded successfully")
+                return model
             except Exception as e2:
                 logger.error(f"❌ Fallback model initialization failed: {str(e2)}")
                 raise
     
+    def _load_keyword_index(self):
+        """
+        Build the keyword -> document index with a single pass over the collection
+        Only the keywords field is read here; document bodies are fetched on demand
+        """
+        index = {}
+        doc_ids = []   # document position -> doc id
+        
+        for doc in self.db.collection(self.collection).select(['keywords']).stream():
+            doc_ids.append(doc.id)
+            data = doc.to_dict() or {}
+            for kw in data.get('keywords', []):
+                ids = index.setdefault(kw.lower(), [])
+                if doc.id not in ids:
+                    ids.append(doc.id)
+        
+        # Posting arrays of document positions per keyword: scoring a query is then
+        # a bincount over the postings of its matched keywords, i.e. the sparse
+        # doc x keyword matrix times the query's keyword indicator vector
+        doc_positions = {doc_id: position for position, doc_id in enumerate(doc_ids)}
+        postings = {
+            kw: np.fromiter((doc_positions[doc_id] for doc_id in ids), dtype=np.intp, count=len(ids))
+            for kw, ids in index.items()
+        }
+        
+        # One automaton over every keyword: a description is scanned once,
+        # in O(len(description) + matches), however many keywords exist
+        automaton = None
+        if index:
+            automaton = ahocorasick.Automaton()
+            for kw in index:
+                automaton.add_word(kw, kw)
+            automaton.make_automaton()
+        
+        # Keyword previews for the no-match path, built once per index load
+        sorted_keywords = sorted(index)
+        keywords_preview_str = ', '.join(sorted_keywords[:50])
+        keywords_preview_short = ', '.join(sorted_keywords[:20])
+        
+        with self._index_lock:
+            self._index = index
+            self._postings = postings
+            self._doc_ids = doc_ids
+            self._automaton = automaton
+            self._keywords_preview_str = keywords_preview_str
+            self._keywords_preview_short = keywords_preview_short
+            self._doc_cache = {}
+            self._index_loaded_at = time.monotonic()
+            self._context_cache.clear()
+        
+        logger.info(f"📇 Indexed {len(index)} keywords across {len(doc_ids)} knowledge base documents")
+    
+    def _get_documents(self, doc_ids) -> dict:
+        """
+        Return {doc_id: data} for the given ids
+        Documents not cached yet are fetched together in one batched get_all call
+        """
+        with self._index_lock:
+            doc_cache = self._doc_cache
+        
+        missing = [doc_id for doc_id in doc_ids if doc_id not in doc_cache]
+        if missing:
+            collection = self.db.collection(self.collection)
+            refs = [collection.document(doc_id) for doc_id in missing]
+            for doc in self.db.get_all(refs):
+                if doc.exists:
+                    doc_cache[doc.id] = doc.to_dict() or {}
+        
+        return {doc_id: doc_cache[doc_id] for doc_id in doc_ids if doc_id in doc_cache}
+    
+    def _ensure_keyword_index(self):
+        """Refresh the keyword index once its TTL has expired"""
+        if time.monotonic() - self._index_loaded_at < _KEYWORD_INDEX_TTL_SECONDS:
+            return
+        try:
+            self._load_keyword_index()
+        except Exception as e:
+            # Keep serving from the stale index rather than failing the request
+            logger.warning(f"⚠️ Keyword index refresh failed, using cached index: {str(e)}")
+    
     def _retrieve_context(self, description: str) -> str:
         """
         Retrieve relevant cultural context from Firestore using RAG
-        Dynamically searches the cultural_knowledge_base for matching art forms
+        Repeat descriptions (after case/whitespace normalization) are served from an LRU
+        that is cleared whenever the keyword index is rebuilt
+        """
+        self._ensure_keyword_index()
+        cache_key = " ".join(description.lower().split())
+        
+        with self._index_lock:
+            context = self._context_cache.get(cache_key)
+            if context is not None:
+                self._context_cache.move_to_end(cache_key)
+        if context is not None:
+            logger.info("⚡ Context cache hit")
+            return context
+        
+        context = self._search_knowledge_base(description)
+        
+        with self._index_lock:
+            self._context_cache[cache_key] = context
+            if len(self._context_cache) > _CONTEXT_CACHE_SIZE:
+                self._context_cache.popitem(last=False)
+        return context
+    
+    def _search_knowledge_base(self, description: str) -> str:
+        """
+        Dynamically searches the cultural_knowledge_base index for matching art forms
         """
         description_lower = description.lower()
-        logger.info(f"🔍 Searching cultural knowledge base for: {description}")
+        logger.info("🔍 Searching cultural knowledge base for: %s", description)
         
-        # Fetch ALL documents from cultural_knowledge_base
-        all_docs = self.db.collection(self.collection).stream()
+        with self._index_lock:
+            index = self._index
+            postings = self._postings
+            doc_ids = self._doc_ids
+            automaton = self._automaton
+            keywords_preview_str = self._keywords_preview_str
+            keywords_preview_short = self._keywords_preview_short
         
-        matched_contexts = []
-        all_keywords_from_db = []
+        # Single multi-pattern scan of the description; substring semantics as before
+        matched_keywords = []
+        if automaton is not None:
+            matched_keywords = list(dict.fromkeys(kw for _end, kw in automaton.iter(description_lower)))
         
-        # Process each document and check for keyword matches
-        for doc in all_docs:
-            data = doc.to_dict()
-            
-            # Extract keywords from the document
-            doc_keywords = data.get('keywords', [])
-            all_keywords_from_db.extend(doc_keywords)
-            
-            # Check if any keyword from the document appears in the description
-            keyword_matches = [kw for kw in doc_keywords if kw.lower() in description_lower]
-            
-            if keyword_matches:
-                # Calculate match score (how many keywords matched)
-                match_score = len(keyword_matches)
-                
-                # Build rich context from matched document
-                context_parts = []
-                
-                # Art form name
-                if data.get('art_form'):
-                    context_parts.append(f"Art Form: {data['art_form']}")
-                elif data.get('artifact_type'):
-                    context_parts.append(f"Artifact Type: {data['artifact_type']}")
-                
-                # Region
-                if data.get('region'):
-                    context_parts.append(f"Region: {data['region']}")
-                
-                # Cultural significance
-                if data.get('cultural_significance'):
-                    context_parts.append(f"Cultural Significance: {data['cultural_significance']}")
-                
-                # Historical context
-                if data.get('historical_context'):
-                    context_parts.append(f"Historical Context: {data['historical_context']}")
-                
-                # Techniques
-                if data.get('technique'):
-                    context_parts.append(f"Technique: {data['technique']}")
-                elif data.get('techniques'):
-                    techniques = ', '.join(data['techniques']) if isinstance(data['techniques'], list) else data['techniques']
-                    context_parts.append(f"Techniques: {techniques}")
-                
-                # Traditional motifs
-                if data.get('traditional_motifs'):
-                    motifs = ', '.join(data['traditional_motifs']) if isinstance(data['traditional_motifs'], list) else data['traditional_motifs']
-                    context_parts.append(f"Traditional Motifs: {motifs}")
-                
-                # Materials
-                if data.get('materials'):
-                    materials = ', '.join(data['materials']) if isinstance(data['materials'], list) else data['materials']
-                    context_parts.append(f"Materials: {materials}")
-                
-                # Colors/Palette
-                if data.get('colors'):
-                    colors = ', '.join(data['colors']) if isinstance(data['colors'], list) else data['colors']
-                    context_parts.append(f"Color Palette: {colors}")
-                
-                # Visual characteristics
-                if data.get('visual_characteristics'):
-                    context_parts.append(f"Visual Characteristics: {data['visual_characteristics']}")
-                
-                # Famous artisans/centers
-                if data.get('famous_artisans'):
-                    context_parts.append(f"Famous Artisans: {data['famous_artisans']}")
-                if data.get('famous_centers'):
-                    centers = ', '.join(data['famous_centers']) if isinstance(data['famous_centers'], list) else data['famous_centers']
-                    context_parts.append(f"Famous Centers: {centers}")
-                
-                # Story elements
-                if data.get('story_elements'):
-                    story = ', '.join(data['story_elements']) if isinstance(data['story_elements'], list) else data['story_elements']
-                    context_parts.append(f"Story Elements: {story}")
-                
-                # Common uses
-                if data.get('common_uses'):
-                    uses = ', '.join(data['common_uses']) if isinstance(data['common_uses'], list) else data['common_uses']
-                    context_parts.append(f"Common Uses: {uses}")
-                
-                # Philosophy
-                if data.get('philosophy'):
-                    context_parts.append(f"Philosophy: {data['philosophy']}")
-                
-                # Example descriptions for image generation
-                if data.get('example_description'):
-                    context_parts.append(f"Visual Example: {data['example_description']}")
-                
-                matched_context = {
-                    'score': match_score,
-                    'matched_keywords': keyword_matches,
-                    'context': '\n'.join(context_parts)
-                }
-                
-                matched_contexts.append(matched_context)
-                logger.info(f"✅ Matched document with keywords: {keyword_matches} (score: {match_score})")
+        # Score every document at once (score = matched keyword count), keep the
+        # top 3; only those documents are fetched and rendered into context
+        top_matches = []
+        if matched_keywords:
+            scores = np.bincount(
+                np.concatenate([postings[kw] for kw in matched_keywords]),
+                minlength=len(doc_ids)
+            )
+            for position in _top_k_positions(scores, 3):
+                doc_id = doc_ids[position]
+                top_matches.append((doc_id, [kw for kw in matched_keywords if doc_id in index[kw]]))
         
-        # Sort by match score (highest first) and take top 3
-        matched_contexts.sort(key=lambda x: x['score'], reverse=True)
-        top_matches = matched_contexts[:3]
+        doc_cache = self._get_documents([doc_id for doc_id, _ in top_matches])
         
-        if top_matches:
+        context_blocks = []
+        for doc_id, keyword_matches in top_matches:
+            data = doc_cache.get(doc_id)
+            if not data:
+                continue
+            logger.info("✅ Matched document with keywords: %s (score: %d)", keyword_matches, len(keyword_matches))
+            context_blocks.append(f"Matched Keywords: {', '.join(keyword_matches)}\n{_format_context(data)}")
+        
+        if context_blocks:
             # Combine top matches into a single context string
-            context_string = "\n\n---\n\n".join([
-                f"Matched Keywords: {', '.join(match['matched_keywords'])}\n{match['context']}"
-                for match in top_matches
-            ])
+            context_string = "\n\n---\n\n".join(context_blocks)
             
-            logger.info(f"📚 Retrieved {len(top_matches)} relevant context(s) from knowledge base")
+            logger.info("📚 Retrieved %d relevant context(s) from knowledge base", len(context_blocks))
             return context_string
         else:
             # No keyword matches found - provide fallback guidance
-            logger.warning(f"⚠️ No direct matches found in knowledge base for description: {description[:100]}")
-            logger.info(f"💡 Available keywords in database: {', '.join(set(all_keywords_from_db[:50]))}")
+            logger.warning("⚠️ No direct matches found in knowledge base for description: %.100s", description)
+            logger.info("💡 Available keywords in database: %s", keywords_preview_str)
             
             # Return a generic Indian craft context
             return f"""
@@ -197,35 +642,72 @@ Focus on:
 - Artisan journey and emotional connection
 - Authentic regional characteristics if any are mentioned
 
-Available art forms in database: {', '.join(set(all_keywords_from_db[:20]))}
+Available art forms in database: {keywords_preview_short}
 """
     
     def _extract_json(self, response_text: str) -> dict:
         """
-        Robust JSON extraction from LLM responses
+        JSON extraction from LLM responses
+        Responses are schema-constrained JSON, so this is a single parse with one
+        strict fallback (outermost {...} object). The old heuristic repair cascade
+        only runs when _LEGACY_JSON_REPAIR is enabled.
+        """
+        result = self._parse_json_strict(response_text)
+        if result is not None:
+            return result
+        
+        if _LEGACY_JSON_REPAIR:
+            return self._legacy_repair_json(response_text)
+        
+        logger.error("All JSON parsing attempts failed")
+        raise ValueError(f"Could not extract valid JSON from AI response. Response preview: {response_text[:200]}")
+    
+    @staticmethod
+    def _parse_json_strict(response_text: str):
+        """Parse the response as-is (bare, fenced, or the outermost embedded object); None if that fails"""
+        logger.debug("Raw AI response: %.500s...", response_text)
+        
+        # Fast path: bare or ```json fenced object, sliced without regex and parsed once
+        text = response_text.strip()
+        if text.startswith("```"):
+            body_start = text.find("\n") + 1
+            body_end = text.rfind("```")
+            if body_start:
+                text = (text[body_start:body_end] if body_end >= body_start else text[body_start:]).strip()
+        if text.startswith("{"):
+            body_end = text.rfind("}")
+            if body_end != -1:
+                try:
+                    return json.loads(text[:body_end + 1])
+                except json.JSONDecodeError:
+                    pass
+        
+        # Strict fallback: the outermost object embedded in surrounding text
+        json_match = _PAT_OBJ.search(response_text)
+        if json_match:
+            try:
+                return json.loads(json_match.group(1))
+            except json.JSONDecodeError:
+                pass
+        return None
+    
+    def _legacy_repair_json(self, response_text: str) -> dict:
+        """
+        Heuristic repair for free-text (non schema-constrained) responses
         Handles common formatting issues:
         - Markdown code blocks (```json ...)
-        - Double quotes inside strings
         - Trailing commas
         - Multi-line strings
-        - Incomplete JSON
+        - Incomplete JSON (manual field extraction)
         """
-        logger.debug(f"Raw AI response: {response_text[:500]}...")
-        
-        # Try direct JSON parsing first
-        try:
-            return json.loads(response_text)
-        except json.JSONDecodeError:
-            pass
-        
         # Remove markdown code block indicators
-        cleaned = re.sub(r'```json\s*', '', response_text)
-        cleaned = re.sub(r'\s*```', '', cleaned)
+        cleaned = _PAT_JSON_FENCE.sub('', response_text)
+        cleaned = _PAT_FENCE_END.sub('', cleaned)
         cleaned = cleaned.strip()
         
         # Fix trailing commas before } and ]
-        cleaned = re.sub(r',\s*}', '}', cleaned)
-        cleaned = re.sub(r',\s*]', ']', cleaned)
+        cleaned = _PAT_TRAIL_OBJ.sub('}', cleaned)
+        cleaned = _PAT_TRAIL_ARR.sub(']', cleaned)
         
         # Try parsing the cleaned version
         try:
@@ -237,62 +719,12 @@ Available art forms in database: {', '.join(set(all_keywords_from_db[:20]))}
         # Replace literal newlines within JSON strings with \n
         try:
             # Find the JSON object boundaries
-            json_match = re.search(r'(\{[\s\S]*\})', cleaned)
+            json_match = _PAT_OBJ.search(cleaned)
             if json_match:
                 json_str = json_match.group(1)
                 
-                # Use a more lenient parser by replacing problematic newlines
-                # This regex finds string values and escapes newlines within them
-                def fix_string_newlines(match):
-                    content = match.group(1)
-                    # Replace actual newlines with escaped newlines
-                    fixed = content.replace('\n', '\\n').replace('\r', '\\r')
-                    # Also escape any unescaped quotes
-                    fixed = fixed.replace('\\"', '"').replace('"', '\\"')
-                    return f'"{fixed}"'
-                
-                # This pattern matches string values in JSON (very simplified)
-                # We'll try a different approach: parse line by line
-                lines = json_str.split('\n')
-                fixed_lines = []
-                in_string = False
-                current_key = None
-                
-                for line in lines:
-                    stripped = line.strip()
-                    
-                    # Detect if we're starting a string value
-                    if ':' in stripped and '"' in stripped:
-                        # Check if this line has a complete string value
-                        parts = stripped.split(':', 1)
-                        if len(parts) == 2:
-                            key_part = parts[0].strip()
-                            value_part = parts[1].strip()
-                            
-                            # Count quotes in value part
-                            quote_count = value_part.count('"')
-                            
-                            # If odd number of quotes, we have an unterminated string
-                            if quote_count % 2 == 1:
-                                in_string = True
-                                current_key = key_part
-                                fixed_lines.append(line.rstrip())
-                                continue
-                    
-                    # If we're in a multi-line string, continue building it
-                    if in_string:
-                        # Check if this line closes the string
-                        if '"' in stripped and stripped.endswith('"') or stripped.endswith('",'):
-                            in_string = False
-                            fixed_lines.append(line.rstrip())
-                        else:
-                            # Continue the string on this line (escape the content)
-                            fixed_lines.append(line.rstrip())
-                        continue
-                    
-                    fixed_lines.append(line)
-                
-                fixed_json = '\n'.join(fixed_lines)
+                # Escape raw newlines that appear inside string values
+                fixed_json = _escape_newlines_in_strings(json_str)
                 
                 try:
                     return json.loads(fixed_json)
@@ -305,45 +737,29 @@ Available art forms in database: {', '.join(set(all_keywords_from_db[:20]))}
         try:
             logger.info("🔧 Attempting manual field extraction from AI response...")
             
-            # Extract individual fields with more lenient patterns
-            title_match = re.search(r'"story_title"\s*:\s*"([^"]+)"', response_text, re.IGNORECASE)
-            theme_match = re.search(r'"emotional_theme"\s*:\s*"([^"]+)"', response_text, re.IGNORECASE)
+            # One pass each for the scalar fields and the array fields (first occurrence wins)
+            fields = {}
+            for match in _PAT_ALL_FIELDS.finditer(response_text):
+                fields.setdefault(match.group('field').lower(), match.group('val'))
+            for match in _PAT_ALL_ARRAYS.finditer(response_text):
+                fields.setdefault(match.group('field').lower(), _PAT_STR_ITEM.findall(match.group('val')))
             
-            # Extract story_text (may span multiple lines)
-            story_match = re.search(r'"story_text"\s*:\s*"((?:[^"\\]|\\.)*)"', response_text, re.DOTALL | re.IGNORECASE)
-            if not story_match:
+            story_text = fields.get("story_text")
+            if story_text is None:
                 # Try alternative pattern for multi-line text
-                story_match = re.search(r'"story_text"\s*:\s*"([^"]*(?:"[^"]*)*)"', response_text, re.IGNORECASE)
+                story_match = _PAT_STORY_LOOSE.search(response_text)
+                story_text = story_match.group(1) if story_match else None
             
-            # Extract image_prompts array
-            prompts_match = re.search(r'"image_prompts"\s*:\s*\[(.*?)\]', response_text, re.DOTALL | re.IGNORECASE)
-            prompts = []
-            if prompts_match:
-                prompts_str = prompts_match.group(1)
-                # Extract individual prompts
-                individual_prompts = re.findall(r'"((?:[^"\\]|\\.)*)"', prompts_str)
-                prompts = individual_prompts[:3]  # Take first 3
+            prompts = fields.get("image_prompts", [])[:3]  # Take first 3
+            cultural = fields.get("cultural_elements")
+            hashtags = fields.get("recommended_hashtags")
             
-            # Extract cultural_elements array
-            cultural_match = re.search(r'"cultural_elements"\s*:\s*\[(.*?)\]', response_text, re.DOTALL | re.IGNORECASE)
-            cultural = []
-            if cultural_match:
-                cultural_str = cultural_match.group(1)
-                cultural = re.findall(r'"((?:[^"\\]|\\.)*)"', cultural_str)
-            
-            # Extract hashtags array  
-            hashtags_match = re.search(r'"recommended_hashtags"\s*:\s*\[(.*?)\]', response_text, re.DOTALL | re.IGNORECASE)
-            hashtags = []
-            if hashtags_match:
-                hashtags_str = hashtags_match.group(1)
-                hashtags = re.findall(r'"((?:[^"\\]|\\.)*)"', hashtags_str)
-            
-            if title_match and theme_match:
+            if fields.get("story_title") and fields.get("emotional_theme"):
                 logger.info("✅ Successfully extracted fields manually")
                 return {
-                    "story_title": title_match.group(1),
-                    "emotional_theme": theme_match.group(1),
-                    "story_text": story_match.group(1) if story_match else "Story text could not be extracted.",
+                    "story_title": fields["story_title"],
+                    "emotional_theme": fields["emotional_theme"],
+                    "story_text": story_text if story_text is not None else "Story text could not be extracted.",
                     "image_prompts": prompts if prompts else [
                         "A traditional Indian artisan working with traditional materials, warm lighting, cultural authenticity",
                         "Hands crafting artwork with traditional tools, soft focus, heritage preservation", 
@@ -356,127 +772,304 @@ Available art forms in database: {', '.join(set(all_keywords_from_db[:20]))}
             logger.error(f"Manual field extraction failed: {str(fallback_error)}")
         
         # Ultimate fallback
-        logger.error(f"All JSON parsing attempts failed")
+        logger.error("All JSON parsing attempts failed")
         raise ValueError(f"Could not extract valid JSON from AI response. Response preview: {response_text[:200]}")
     
-    def generate_image_prompts(self, artisan_description: str) -> dict:
+    @staticmethod
+    def _exact_cache_key(artisan_description: str) -> str:
+        """Content hash of the normalized description, versioned with the response schema"""
+        normalized = " ".join(artisan_description.lower().split())
+        return hashlib.sha256(f"{_EXACT_CACHE_VERSION}:{normalized}".encode("utf-8")).hexdigest()
+    
+    def _cache_lookup(self, artisan_description: str):
         """
-        Generate complete storytelling package including narrative text and visual prompts
-        Creates both story text for sharing and prompts for image generation
+        Probe the response caches: local disk, then exact content hash
+        (one document read), then the semantic cache
+        Returns (embedding, cached_package); either may be None
         """
-        logger.info(f"🎨 Generating image prompts for: {artisan_description}")
+        key = self._exact_cache_key(artisan_description)
+        if self.disk_cache is not None:
+            cached = self.disk_cache.get(key)
+            if _is_cacheable_package(cached):
+                logger.info("⚡ Disk cache hit")
+                return None, cached
         
-        context = self._retrieve_context(artisan_description)
-        logger.info(f"📚 Retrieved context:\n{context}")
+        try:
+            snapshot = self.db.collection(_EXACT_CACHE_COLLECTION).document(key).get()
+            response = (snapshot.to_dict() or {}).get('response') if snapshot.exists else None
+            if _is_cacheable_package(response):
+                logger.info("⚡ Exact cache hit")
+                self._disk_cache_store(key, response)
+                return None, response
+        except Exception as e:
+            logger.warning(f"⚠️ Exact cache lookup failed: {str(e)}")
         
-        prompt = f"""
-        You are a cultural storyteller for Indian artisans. Create storytelling content with image prompts.
+        if self.semantic_cache is None:
+            return None, None
+        try:
+            embedding = self.semantic_cache.embed(artisan_description)
+            return embedding, self.semantic_cache.lookup(embedding)
+        except Exception as e:
+            logger.warning(f"⚠️ Semantic cache lookup failed: {str(e)}")
+            return None, None
+    
+    def _disk_cache_store(self, key: str, result: dict):
+        if self.disk_cache is None or result is None:
+            return
+        try:
+            self.disk_cache.set(key, result, expire=_DISK_CACHE_TTL_SECONDS)
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to persist disk cache entry: {str(e)}")
+    
+    def _exact_cache_store(self, artisan_description: str, result: dict):
+        from google.cloud import firestore
         
+        key = self._exact_cache_key(artisan_description)
+        self._disk_cache_store(key, result)
+        try:
+            self.db.collection(_EXACT_CACHE_COLLECTION).document(key).set({
+                'description': artisan_description,
+                'response': result,
+                'created_at': firestore.SERVER_TIMESTAMP
+            })
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to persist exact cache entry: {str(e)}")
+    
+    def _build_prompt(self, context: str) -> str:
+        """
+        Build the per-request user turn
+        Only the retrieved context varies; the static instructions live in the
+        system instruction, see _STORYTELLER_INSTRUCTIONS
+        """
+        return f"""
         Use this cultural context:
         {context}
         
-        Create:
-        1. Story Title (5-10 words)
-        2. Story Text (150-200 words) - ONE continuous line, no line breaks
-        3. Emotional Theme (one word: heritage/pride/tradition/craftsmanship/legacy)
-        4. Three Image Prompts (80-100 words each) - ONE line each, describe specific visual scenes
-        5. Three Cultural Elements (key cultural aspects)
-        6. Three Hashtags (relevant social media tags)
-        
-        Return ONLY this JSON format:
-        {{
-          "story_title": "Title here",
-          "story_text": "Complete story in one line",
-          "emotional_theme": "Theme",
-          "image_prompts": [
-            "First visual scene with lighting and composition details",
-            "Second visual scene with mood and cultural elements",
-            "Third visual scene with artisan focus and authenticity"
-          ],
-          "cultural_elements": ["element1", "element2", "element3"],
-          "recommended_hashtags": ["hashtag1", "hashtag2", "hashtag3"]
-        }}
-        
-        RULES: No line breaks in strings. Write everything in single lines. Valid JSON only.
+        Create the storytelling package for this craft as the JSON object described in your instructions.
+        """
+    
+    @staticmethod
+    def _generation_config(max_output_tokens: int) -> dict:
+        # Structured output: Gemini is constrained to emit JSON matching the schema,
+        # so the response parses directly without fences or prose around it
+        # Greedy decoding: the same description always yields the same package,
+        # which is what makes the exact-match cache meaningful
+        return {
+            "temperature": 0.0,
+            "max_output_tokens": max_output_tokens,
+            "top_p": 1.0,
+            "top_k": 1,
+            "response_mime_type": "application/json",
+            "response_schema": _RESPONSE_SCHEMA
+        }
+    
+    @staticmethod
+    def _hit_token_limit(response) -> bool:
+        """Check whether the response stopped on the output token limit"""
+        if hasattr(response, 'candidates') and response.candidates:
+            candidate = response.candidates[0]
+            return getattr(candidate, 'finish_reason', None) == 3  # MAX_TOKENS
+        return False
+    
+    def _finish_response(self, response_text: str, artisan_description: str, cache_embedding) -> dict:
+        """
+        Parse the model response text and store it in the response caches
+        Decoding is greedy, so a cached package is what every later request gets:
+        (and the semantic cache reuses it for similar descriptions): only complete
+        packages parsed without legacy repair are stored
         """
+        logger.info("🤖 AI response received: %.100s...", response_text)
+        
+        result = self._parse_json_strict(response_text)
+        if result is None:
+            # Raises unless legacy repair is enabled; repaired output is never cached
+            return self._extract_json(response_text)
+        
+        if not _is_cacheable_package(result):
+            logger.warning("⚠️ Incomplete storytelling package, not caching it")
+            return result
+        
+        self._exact_cache_store(artisan_description, result)
+        if cache_embedding is not None:
+            self.semantic_cache.add(cache_embedding, artisan_description, result)
+        
+        return result
+    
+    def generate_image_prompts(self, artisan_description: str, force_refresh: bool = False) -> dict:
+        """
+        Generate complete storytelling package including narrative text and visual prompts
+        Creates both story text for sharing and prompts for image generation
+        force_refresh bypasses the response caches (the fresh result still refreshes them)
+        """
+        logger.info("🎨 Generating image prompts for: %s", artisan_description)
+        
+        # Reuse a cached package for semantically equivalent descriptions
+        cache_embedding, cached = (None, None) if force_refresh else self._cache_lookup(artisan_description)
+        if cached is not None:
+            return cached
+        
+        context = self._retrieve_context(artisan_description)
+        logger.info("📚 Retrieved context:\n%s", context)
+        
+        prompt = self._build_prompt(context)
         
         try:
             response = self.model.generate_content(
                 prompt,
-                generation_config={
-                    "temperature": 0.4,
-                    "max_output_tokens": 4096,  # Increased from 2048 to allow longer responses
-                    "top_p": 0.85,
-                    "top_k": 40
-                }
+                generation_config=self._generation_config(_DEFAULT_MAX_OUTPUT_TOKENS)
             )
             
-            # Check if response was completed or hit token limit
-            if hasattr(response, 'candidates') and response.candidates:
-                candidate = response.candidates[0]
-                if hasattr(candidate, 'finish_reason'):
-                    if candidate.finish_reason == 3:  # MAX_TOKENS
-                        logger.warning("⚠️ Response hit max token limit, retrying with shorter prompt...")
-                        # Retry with shorter, more focused prompt
-                        short_prompt = f"""
-                        Create a storytelling package for this Indian craft:
-                        
-                        Cultural Context:
-                        {context[:500]}...
-                        
-                        Return ONLY this JSON (keep story_text under 200 words, each image prompt under 100 words):
-                        {{
-                          "story_title": "Short title",
-                          "story_text": "Brief story in ONE line",
-                          "emotional_theme": "Theme",
-                          "image_prompts": ["Prompt 1", "Prompt 2", "Prompt 3"],
-                          "cultural_elements": ["element1", "element2", "element3"],
-                          "recommended_hashtags": ["tag1", "tag2", "tag3"]
-                        }}
-                        """
-                        
-                        response = self.model.generate_content(
-                            short_prompt,
-                            generation_config={
-                                "temperature": 0.4,
-                                "max_output_tokens": 2048,
-                                "top_p": 0.85,
-                                "top_k": 40
-                            }
-                        )
+            # Retry once with the larger ceiling; most responses fit the default
+            if self._hit_token_limit(response):
+                logger.warning(f"⚠️ Response hit {_DEFAULT_MAX_OUTPUT_TOKENS} token limit, retrying with {_RETRY_MAX_OUTPUT_TOKENS}...")
+                response = self.model.generate_content(
+                    prompt,
+                    generation_config=self._generation_config(_RETRY_MAX_OUTPUT_TOKENS)
+                )
             
-            response_text = response.text
-            logger.info(f"🤖 AI response received: {response_text[:100]}...")
+            return self._finish_response(response.text, artisan_description, cache_embedding)
+                
+        except Exception as e:
+            logger.error(f"❌ Error generating image prompts: {str(e)}")
+            raise
+    
+    async def generate_image_prompts_async(self, artisan_description: str) -> dict:
+        """
+        Async variant of generate_image_prompts
+        Runs the semantic cache lookup and knowledge base retrieval concurrently,
+        so latency is max(cache, retrieval) rather than their sum, then calls Gemini
+        without blocking the event loop
+        """
+        logger.info("🎨 Generating image prompts (async) for: %s", artisan_description)
+        
+        cache_task = asyncio.create_task(asyncio.to_thread(self._cache_lookup, artisan_description))
+        context_task = asyncio.create_task(asyncio.to_thread(self._retrieve_context, artisan_description))
+        
+        cache_embedding, cached = await cache_task
+        if cached is not None:
+            context_task.cancel()
+            return cached
+        
+        context = await context_task
+        logger.info("📚 Retrieved context:\n%s", context)
+        
+        prompt = self._build_prompt(context)
+        
+        try:
+            response = await self.model.generate_content_async(
+                prompt,
+                generation_config=self._generation_config(_DEFAULT_MAX_OUTPUT_TOKENS)
+            )
             
-            # Use robust JSON extraction
-            return self._extract_json(response_text)
+            if self._hit_token_limit(response):
+                logger.warning(f"⚠️ Response hit {_DEFAULT_MAX_OUTPUT_TOKENS} token limit, retrying with {_RETRY_MAX_OUTPUT_TOKENS}...")
+                response = await self.model.generate_content_async(
+                    prompt,
+                    generation_config=self._generation_config(_RETRY_MAX_OUTPUT_TOKENS)
+                )
+            
+            # Cache writes are blocking Firestore calls; keep them off the event loop
+            return await asyncio.to_thread(self._finish_response, response.text, artisan_description, cache_embedding)
                 
         except Exception as e:
             logger.error(f"❌ Error generating image prompts: {str(e)}")
             raise
     
+    async def generate_image_prompts_batch(self, artisan_descriptions: list, concurrency: int = 8) -> list:
+        """
+        Generate packages for many descriptions concurrently (e.g. nightly precompute)
+        Each description still goes through the cache layers first; at most `concurrency`
+        requests are in flight and repeated descriptions are generated once.
+        Results are returned in input order.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+        unique_descriptions = list(dict.fromkeys(artisan_descriptions))
+        
+        async def generate_one(description):
+            async with semaphore:
+                return await self.generate_image_prompts_async(description)
+        
+        logger.info(f"📦 Generating {len(unique_descriptions)} storytelling package(s) with concurrency {concurrency}")
+        results = await asyncio.gather(*(generate_one(d) for d in unique_descriptions))
+        by_description = dict(zip(unique_descriptions, results))
+        return [copy.deepcopy(by_description[d]) for d in artisan_descriptions]
+    
+    def stream_image_prompts(self, artisan_description: str):
+        """
+        Streaming variant of generate_image_prompts
+        Yields a partial package each time another field is complete in the streamed
+        response (story_title/story_text usually arrive well before the image prompts),
+        then yields the fully parsed package last
+        """
+        logger.info("🎨 Streaming image prompts for: %s", artisan_description)
+        
+        cache_embedding, cached = self._cache_lookup(artisan_description)
+        if cached is not None:
+            yield cached
+            return
+        
+        context = self._retrieve_context(artisan_description)
+        logger.info("📚 Retrieved context:\n%s", context)
+        
+        prompt = self._build_prompt(context)
+        
+        try:
+            buffer = io.StringIO()
+            partial = {}
+            last_chunk = None
+            
+            for chunk in self.model.generate_content(
+                prompt,
+                generation_config=self._generation_config(_DEFAULT_MAX_OUTPUT_TOKENS),
+                stream=True
+            ):
+                last_chunk = chunk
+                try:
+                    buffer.write(chunk.text)
+                except ValueError:
+                    # Chunks carrying only finish metadata have no text
+                    continue
+                
+                fields = _extract_complete_fields(buffer.getvalue())
+                if len(fields) > len(partial):
+                    partial = fields
+                    yield dict(partial)
+            
+            if last_chunk is not None and self._hit_token_limit(last_chunk):
+                logger.warning(f"⚠️ Response hit {_DEFAULT_MAX_OUTPUT_TOKENS} token limit, retrying with {_RETRY_MAX_OUTPUT_TOKENS}...")
+                response = self.model.generate_content(
+                    prompt,
+                    generation_config=self._generation_config(_RETRY_MAX_OUTPUT_TOKENS)
+                )
+                yield self._finish_response(response.text, artisan_description, cache_embedding)
+                return
+            
+            yield self._finish_response(buffer.getvalue(), artisan_description, cache_embedding)
+                
+        except Exception as e:
+            logger.error(f"❌ Error streaming image prompts: {str(e)}")
+            raise
+    
     def validate_prompts(self, image_prompts_dict, artisan_description: str) -> dict:
         """Validate image prompts for cultural accuracy and generation quality"""
         logger.info("🛡️ Validating image prompts for cultural accuracy...")
         
-        # Ensure required fields exist
-        required_fields = ["story_title", "story_text", "emotional_theme", "image_prompts", "cultural_elements", "recommended_hashtags"]
-        for field in required_fields:
-            if field not in image_prompts_dict:
-                logger.error(f"❌ Missing required field: {field}")
-                raise ValueError(f"Missing required field: {field}")
+        # Ensure required fields exist (reports every missing field at once)
+        missing = _REQUIRED_FIELDS - image_prompts_dict.keys()
+        if missing:
+            logger.error(f"❌ Missing required fields: {sorted(missing)}")
+            raise ValueError(f"Missing required fields: {sorted(missing)}")
         
         # Check prompt quality for image generation
         for i, prompt in enumerate(image_prompts_dict["image_prompts"]):
+            prompt_lower = prompt.lower()
+            
             # Check for visual details
-            visual_elements = ["lighting", "composition", "angle", "mood", "texture", "color"]
-            if not any(element in prompt.lower() for element in visual_elements):
+            if not any(element in prompt_lower for element in _VISUAL_ELEMENTS):
                 logger.warning(f"⚠️ Prompt {i+1} lacks visual detail elements for good image generation")
             
             # Check for cultural accuracy
-            indian_elements = ["india", "indian", "jaipur", "kutch", "rajasthan", "gujarat", 
-                              "shilp", "kala", "karuna", "quartz", "cobalt", "handmade"]
-            if not any(element in prompt.lower() for element in indian_elements):
+            if not any(element in prompt_lower for element in _INDIAN_ELEMENTS):
                 logger.warning(f"⚠️ Prompt {i+1} may lack Indian cultural references")
         
         # Validate story text quality
@@ -487,7 +1080,8 @@ Available art forms in database: {', '.join(set(all_keywords_from_db[:20]))}
             logger.warning("⚠️ Story text might be too long for social media sharing")
         
         # Check if story text contains cultural elements
-        if not any(element in story_text.lower() for element in ["india", "indian", "heritage", "tradition", "artisan", "craft"]):
+        story_lower = story_text.lower()
+        if not any(element in story_lower for element in _STORY_CULTURAL_ELEMENTS):
             logger.warning("⚠️ Story text may lack cultural context")
         
         # Add metadata
@@ -496,4 +1090,21 @@ Available art forms in database: {', '.join(set(all_keywords_from_db[:20]))}
         image_prompts_dict["story_word_count"] = len(story_text.split())
         
         logger.info("✅ Image prompts and story text validated successfully!")
-        return image_prompts_dict
\ No newline at end of file
+        return image_prompts_dict
+
+
+_storyteller_instance = None
+_storyteller_lock = threading.Lock()
+
+
+def get_storyteller() -> StorytellerAgent:
+    """
+    Return the process-wide StorytellerAgent, creating it on first use
+    Warm serverless instances reuse the initialized clients, index and caches
+    """
+    global _storyteller_instance
+    if _storyteller_instance is None:
+        with _storyteller_lock:
+            if _storyteller_instance is None:
+                _storyteller_instance = StorytellerAgent()
+    return _storyteller_instance
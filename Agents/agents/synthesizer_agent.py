@@ -8,6 +8,16 @@
 
 import os
 import json
+import string
+import functools
+import hashlib
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
+from dataclasses import dataclass
+import numpy as np
 from PIL import Image, ImageDraw, ImageFont
 import logging
 
@@ -16,6 +26,112 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Vertical distance between wrapped story lines, and the extra gap after each story element, in pixels
+_LINE_PITCH = 50
+_ELEMENT_GAP = 20
+
+# Usable text width in the post's bottom strip (1080px post minus 80px margins)
+_STORY_TEXT_WIDTH = 1080 - 2 * 80
+
+# Craft centres found in cultural_elements, mapped to the region used in listings, in priority order
+_REGION_MAP = {
+    "Jaipur": "Rajasthan",
+    "Kutch": "Gujarat",
+    "Kanchipuram": "Tamil Nadu",
+}
+
+# Rendered posts keyed by a hash of their inputs, so unchanged posts are copied instead of re-rendered.
+# Lives under the temp dir by default and is trimmed least-recently-used first (by mtime, refreshed
+# on every hit) once it exceeds the size limit - on Cloud Run the filesystem is memory
+_POST_CACHE_DIR = os.environ.get("SYNTH_CACHE_DIR", os.path.join(tempfile.gettempdir(), "synth_cache"))
+_POST_CACHE_MAX_BYTES = int(os.environ.get("SYNTH_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+# Part of the cache key; bump whenever create_story_post's drawing changes
+_POST_LAYOUT_VERSION = 2
+
+# E-commerce copy templates, filled with str.format_map from one namespace per story
+_TITLE_FMT = "{title} | Handcrafted by {region} Artisan"
+_DESC_FMT = (
+    "Experience the story behind this creation: {theme}. "
+    "This piece represents generations of tradition and cultural heritage. "
+    "Each element carries deep meaning in Indian craftsmanship, connecting you to "
+    "the artisan's journey and the cultural wisdom passed down through generations."
+)
+_CULTURAL_FMT = (
+    "In {region} tradition, these elements represent {elements}. "
+    "This practice has been preserved through generations as a "
+    "sacred art form, embodying the Indian concept of 'shilp' - "
+    "where art and spirituality intertwine."
+)
+
+
+def _find_font(name: str):
+    """Resolve a font file once: working directory first, then the system font directories"""
+    if os.path.exists(name):
+        return name
+    font_dirs = (
+        os.path.join(os.environ.get("WINDIR", "C:\\Windows"), "Fonts"),
+        "/usr/share/fonts",
+        "/usr/local/share/fonts",
+        "/Library/Fonts",
+        os.path.expanduser("~/.fonts"),
+    )
+    for font_dir in font_dirs:
+        for root, _, files in os.walk(font_dir):
+            if name in files:
+                return os.path.join(root, name)
+    return None
+
+
+# Font files resolved at import; None means Pillow's default font is used
+_FONT_BOLD = _find_font("arialbd.ttf")
+_FONT_REGULAR = _find_font("arial.ttf")
+
+
+def _prune_post_cache():
+    """Delete the least recently used cached posts until the cache fits _POST_CACHE_MAX_BYTES"""
+    entries = []
+    total = 0
+    with os.scandir(_POST_CACHE_DIR) as it:
+        for entry in it:
+            if entry.is_file():
+                stat = entry.stat()
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+                total += stat.st_size
+    if total <= _POST_CACHE_MAX_BYTES:
+        return
+    
+    entries.sort()
+    for _mtime, size, path in entries:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass  # Already evicted by a concurrent render
+        total -= size
+        if total <= _POST_CACHE_MAX_BYTES:
+            break
+
+
+@functools.lru_cache(maxsize=8)
+def _load_font(path, size: int):
+    """Load a TrueType font once per process, falling back to Pillow's default font"""
+    if path is None:
+        return ImageFont.load_default()
+    try:
+        return ImageFont.truetype(path, size)
+    except OSError:  # Unreadable or corrupt font file
+        return ImageFont.load_default()
+
+
+@dataclass(frozen=True)
+class PreparedStory:
+    """Derived strings shared by the social post and e-commerce content for one story"""
+    region: str
+    narrative: str
+    hashtags_str: str
+    cultural_csv: str
+    tags: list
+    story_blocks: tuple  # (wrapped text, line count) per image prompt
+
 
 class ContentSynthesizer:
     """
@@ -23,126 +139,191 @@ class ContentSynthesizer:
     Goal: Create marketing assets that emphasize the artisan's story and cultural heritage
     """
     
-    def __init__(self):
-        # Load fonts (Indian market specific)
-        try:
-            self.font_large = ImageFont.truetype("arialbd.ttf", 48)
-            self.font_medium = ImageFont.truetype("arial.ttf", 36)
-            self.font_small = ImageFont.truetype("arial.ttf", 28)
-        except:
-            # Fallback to default font
-            self.font_large = ImageFont.load_default()
-            self.font_medium = ImageFont.load_default()
-            self.font_small = ImageFont.load_default()
+    def __init__(self, resample=Image.Resampling.LANCZOS):
+        # Resampling filter for story image downscaling (BICUBIC is faster, LANCZOS sharper)
+        self.resample = resample
+        
+        # Load fonts (Indian market specific), shared across instances
+        self.font_large = _load_font(_FONT_BOLD, 48)
+        self.font_medium = _load_font(_FONT_REGULAR, 36)
+        self.font_small = _load_font(_FONT_REGULAR, 28)
+        
+        # Glyph advance widths for wrapping story lines without a FreeType call per candidate line
+        self._advance_medium = {c: self.font_medium.getlength(c) for c in string.printable}
+        self._space_w = self._advance_medium[" "]
     
-    def create_story_post(self, storytelling_dict, image_path: str, output_path: str = "story_post.jpg") -> str:
+    def _advance(self, char: str) -> float:
+        """Advance width of one character in the medium font, measured once on first use"""
+        width = self._advance_medium.get(char)
+        if width is None:
+            width = self._advance_medium[char] = self.font_medium.getlength(char)
+        return width
+    
+    def _wrap(self, text: str) -> tuple:
+        """Greedy word wrap to the story text width using cached advance widths (kerning ignored)"""
+        lines = []
+        current, current_w = [], 0.0
+        for word in text.split():
+            word_w = sum(map(self._advance, word))
+            line_w = current_w + self._space_w + word_w if current else word_w
+            if current and line_w > _STORY_TEXT_WIDTH:
+                lines.append(" ".join(current))
+                current, current_w = [word], word_w
+            else:
+                current.append(word)
+                current_w = line_w
+        if current:
+            lines.append(" ".join(current))
+        return tuple(lines)
+    
+    def prepare(self, storytelling_dict) -> PreparedStory:
+        """Compute the joins, tags, region and wrapped lines once for both output formats"""
+        cultural_elements = storytelling_dict["cultural_elements"]
+        return PreparedStory(
+            # Detect region for platform-specific formatting (first centre in _REGION_MAP order wins)
+            region=next((region for centre, region in _REGION_MAP.items() if centre in cultural_elements), "India"),
+            narrative="\n\n".join(storytelling_dict["image_prompts"]),
+            hashtags_str=" ".join([f"#{tag}" for tag in storytelling_dict["recommended_hashtags"]]),
+            cultural_csv=", ".join(cultural_elements),
+            # Ordered, de-duplicated tags
+            tags=list(dict.fromkeys(chain(
+                cultural_elements,
+                ("Indian", "artisan", "handmade", "story", "cultural heritage", "traditional"),
+                storytelling_dict["recommended_hashtags"]
+            ))),
+            story_blocks=tuple(
+                ("\n".join(lines), len(lines))
+                for lines in map(self._wrap, storytelling_dict["image_prompts"])
+            )
+        )
+    
+    def create_story_post(self, storytelling_dict, image_path: str, output_path: str = "story_post.webp",
+                          prepared: PreparedStory = None) -> str:
         """Create social media post focused on the artisan's story with storytelling image"""
         logger.info("🖼️ Creating story-focused social post with storytelling image...")
         
+        cache_path = self._post_cache_path(storytelling_dict, image_path, output_path)
+        try:
+            shutil.copyfile(cache_path, output_path)
+            os.utime(cache_path)  # Mark as recently used for eviction
+            logger.info(f"✅ Story-focused social post reused from cache: {output_path}")
+            return output_path
+        except FileNotFoundError:
+            pass  # Not cached (or just evicted): render it
+        
+        prepared = prepared or self.prepare(storytelling_dict)
+        
         # Open the storytelling image
         img = Image.open(image_path)
         width, height = img.size
         
         # Resize to Instagram post dimensions if needed
         if width != 1080 or height != 1350:
-            img = img.resize((1080, 1080))
+            # Let the JPEG decoder downscale by DCT (never below 1080 on either side), then one
+            # resample straight to the square; reducing_gap does the bulk with a cheap box reduce
+            img.draft("RGB", (1080, 1080))
+            img = img.resize((1080, 1080), self.resample, reducing_gap=3.0)
             width, height = 1080, 1080
         
         # Create a new image with space for text at the bottom
-        canvas = Image.new('RGB', (width, height + 300), (25, 25, 75))  # Deep blue background
-        canvas.paste(img, (0, 0))
-        
-        draw = ImageDraw.Draw(canvas)
+        arr = np.empty((height + 300, width, 3), dtype=np.uint8)
+        arr[:height] = np.asarray(img.convert("RGB"))
+        arr[height:] = (25, 25, 75)  # Deep blue background
         
-        # Add decorative border (simplified Indian pattern)
+        # Add decorative border (simplified Indian pattern) as four bands over the image area
         border_color = (255, 215, 0)  # Gold
-        for i in range(5):
-            draw.rectangle([i, i, width-i-1, height-i-1], outline=border_color, width=2)
+        thick = 6
+        image_area = arr[:height]
+        image_area[:thick] = border_color
+        image_area[-thick:] = border_color
+        image_area[:, :thick] = border_color
+        image_area[:, -thick:] = border_color
+        
+        canvas = Image.fromarray(arr)
+        draw = ImageDraw.Draw(canvas)
         
         # Add story title
         title = storytelling_dict["story_title"]
-        title_width = draw.textlength(title, font=self.font_large)
-        x = (width - title_width) / 2
-        draw.text((x, height + 30), title, font=self.font_large, fill=(255, 215, 0))  # Gold color
+        draw.text((width / 2, height + 30), title, font=self.font_large, fill=(255, 215, 0), anchor="ma")  # Gold color
         
         # Add emotional theme
         theme = f"Theme: {storytelling_dict['emotional_theme']}"
-        theme_width = draw.textlength(theme, font=self.font_medium)
-        x = (width - theme_width) / 2
-        draw.text((x, height + 90), theme, font=self.font_medium, fill=(255, 255, 255))
+        draw.text((width / 2, height + 90), theme, font=self.font_medium, fill=(255, 255, 255), anchor="ma")
         
-        # Add story elements
-        margin = 80
-        max_width = width - (2 * margin)
+        # Add story elements (pre-wrapped), one multiline call per element
+        # multiline_text's pitch is the height of "A" plus spacing
+        spacing = _LINE_PITCH - self.font_medium.getbbox("A")[3]
         y = height + 140
-        
-        for element in storytelling_dict["image_prompts"]:
-            # Split long elements into multiple lines
-            words = element.split()
-            current_line = []
-            lines = []
-            
-            for word in words:
-                test_line = " ".join(current_line + [word])
-                if draw.textlength(test_line, font=self.font_medium) <= max_width:
-                    current_line.append(word)
-                else:
-                    lines.append(" ".join(current_line))
-                    current_line = [word]
-            
-            if current_line:
-                lines.append(" ".join(current_line))
-            
-            # Draw each line
-            for line in lines:
-                text_width = draw.textlength(line, font=self.font_medium)
-                x = (width - text_width) / 2
-                draw.text((x, y), line, font=self.font_medium, fill=(255, 255, 255))
-                y += 50
-            
-            y += 20  # Space between elements
+        for block, line_count in prepared.story_blocks:
+            if block:
+                draw.multiline_text(
+                    (width / 2, y), block, font=self.font_medium, fill=(255, 255, 255),
+                    anchor="ma", align="center", spacing=spacing
+                )
+            y += line_count * _LINE_PITCH + _ELEMENT_GAP  # Space between elements
         
         # Add hashtags
-        hashtags = " ".join([f"#{tag}" for tag in storytelling_dict["recommended_hashtags"]])
-        hashtags_width = draw.textlength(hashtags, font=self.font_small)
-        x = (width - hashtags_width) / 2
-        draw.text((x, height + 260), hashtags, font=self.font_small, fill=(200, 200, 200))
+        draw.text((width / 2, height + 260), prepared.hashtags_str, font=self.font_small, fill=(200, 200, 200), anchor="ma")
         
-        canvas.save(output_path)
+        # WebP by default; keep JPEG when the caller explicitly asks for a .jpg/.jpeg path
+        if output_path.lower().endswith((".jpg", ".jpeg")):
+            canvas.save(output_path, format="JPEG", quality=85, subsampling=2, progressive=True, optimize=False)
+        else:
+            canvas.save(output_path, format="WEBP", quality=85, method=4)
         logger.info(f"✅ Story-focused social post saved to {output_path}")
+        
+        try:
+            os.makedirs(_POST_CACHE_DIR, exist_ok=True)
+            # Copy then rename, so a concurrent reader never sees a partial file
+            partial_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            shutil.copyfile(output_path, partial_path)
+            os.replace(partial_path, cache_path)
+            _prune_post_cache()
+        except OSError as e:
+            logger.warning(f"⚠️ Could not cache story post: {e}")
         return output_path
     
-    def create_ecommerce_content(self, storytelling_dict) -> dict:
+    def _post_cache_path(self, storytelling_dict, image_path: str, output_path: str) -> str:
+        """Cache file for a post: SHA-1 of the story, the source image's size/mtime, the render settings, layout version and fonts"""
+        stat = os.stat(image_path)
+        ext = os.path.splitext(output_path)[1].lower() or ".webp"
+        key_source = json.dumps(storytelling_dict, sort_keys=True, ensure_ascii=False) + \
+            f"|{os.path.abspath(image_path)}|{stat.st_size}|{stat.st_mtime_ns}|{self.resample}|{ext}" + \
+            f"|v{_POST_LAYOUT_VERSION}|{_FONT_BOLD}|{_FONT_REGULAR}"
+        key = hashlib.sha1(key_source.encode("utf-8")).hexdigest()
+        return os.path.join(_POST_CACHE_DIR, key + ext)
+    
+    def create_posts_batch(self, items: list, max_workers: int = None) -> list:
+        """
+        Create many story posts in parallel (e.g. a batch of artisans)
+        Each item is a tuple of create_story_post arguments:
+        (storytelling_dict, image_path[, output_path[, prepared]]).
+        Pillow releases the GIL while decoding, resampling, drawing and encoding, and the
+        shared fonts are only read, so threads scale with cores. Returns output paths in input order.
+        """
+        max_workers = max_workers or min(8, os.cpu_count() or 1)
+        logger.info(f"🖼️ Creating {len(items)} story post(s) with {max_workers} worker(s)")
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(lambda item: self.create_story_post(*item), items))
+    
+    def create_ecommerce_content(self, storytelling_dict, prepared: PreparedStory = None) -> dict:
         """Format content to emphasize the story and connection"""
         logger.info("🛒 Creating story-focused e-commerce content...")
-        
-        # Detect region for platform-specific formatting
-        region = "India"
-        if "Jaipur" in storytelling_dict["cultural_elements"]:
-            region = "Rajasthan"
-        elif "Kutch" in storytelling_dict["cultural_elements"]:
-            region = "Gujarat"
+        prepared = prepared or self.prepare(storytelling_dict)
+        ns = {
+            "title": storytelling_dict["story_title"],
+            "theme": storytelling_dict["emotional_theme"],
+            "region": prepared.region,
+            "elements": ", ".join(storytelling_dict["cultural_elements"][:2]),
+        }
         
         ecommerce_content = {
-            "title": f"{storytelling_dict['story_title']} | Handcrafted by {region} Artisan",
-            "description": (
-                f"Experience the story behind this creation: {storytelling_dict['emotional_theme']}. "
-                "This piece represents generations of tradition and cultural heritage. "
-                "Each element carries deep meaning in Indian craftsmanship, connecting you to "
-                "the artisan's journey and the cultural wisdom passed down through generations."
-            ),
+            "title": _TITLE_FMT.format_map(ns),
+            "description": _DESC_FMT.format_map(ns),
             "story_section": {
-                "headline": storytelling_dict['story_title'],
-                "narrative": "\n\n".join(storytelling_dict["image_prompts"]),
-                "cultural_significance": (
-                    "In {region} tradition, these elements represent {elements}. "
-                    "This practice has been preserved through generations as a "
-                    "sacred art form, embodying the Indian concept of 'shilp' - "
-                    "where art and spirituality intertwine."
-                ).format(
-                    region=region,
-                    elements=", ".join(storytelling_dict["cultural_elements"][:2])
-                )
+                "headline": ns["title"],
+                "narrative": prepared.narrative,
+                "cultural_significance": _CULTURAL_FMT.format_map(ns)
             },
             "product_representation": {
                 "description": "This product is a physical representation of the story above",
@@ -152,23 +333,23 @@ class ContentSynthesizer:
                     "serves as a vessel for the story and tradition it represents."
                 )
             },
-            "tags": storytelling_dict["cultural_elements"] + ["Indian", "artisan", "handmade", "story", "cultural heritage", "traditional"] + storytelling_dict["recommended_hashtags"],
+            "tags": prepared.tags,
             "indian_platform_specifics": {
                 "flipkart": {
                     "category": "Home & Kitchen > Decor > Handicrafts",
                     "attributes": {
                         "Craft Type": "Storytelling Art Piece",
-                        "Region": region,
-                        "Story Theme": storytelling_dict["emotional_theme"],
-                        "Cultural Elements": ", ".join(storytelling_dict["cultural_elements"])
+                        "Region": ns["region"],
+                        "Story Theme": ns["theme"],
+                        "Cultural Elements": prepared.cultural_csv
                     }
                 },
                 "meesho": {
                     "category": "Home Decor > Storytelling Art",
                     "attributes": {
-                        "Story Title": storytelling_dict["story_title"],
-                        "Emotional Theme": storytelling_dict["emotional_theme"],
-                        "Cultural Elements": ", ".join(storytelling_dict["cultural_elements"])
+                        "Story Title": ns["title"],
+                        "Emotional Theme": ns["theme"],
+                        "Cultural Elements": prepared.cultural_csv
                     }
                 }
             }
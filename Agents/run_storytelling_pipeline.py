@@ -7,7 +7,6 @@
 """
 
 import logging
-from agents.orchestrator import Orchestrator
 
 
 # Configure logging
@@ -35,6 +34,7 @@ def main():
     try:
         # Initialize Orchestrator
         print("\n🔧 Initializing Orchestrator...")
+        from agents.orchestrator import Orchestrator  # Heavy import (SDKs, models), deferred until needed
         orchestrator = Orchestrator()
         
         # Run the complete storytelling pipeline
@@ -56,6 +56,7 @@ def main():
             print("1. storytelling_kit/ - Complete marketing kit")
             print("2. storytelling_kit/story_images/ - Storytelling images")
             print("3. storytelling_kit/marketing_kit.json - Metadata")
+            print("4. storytelling_kit/story_post.webp - Social media post (WebP)")
             print("\n💡 Next steps:")
             print("1. Review the storytelling_kit directory")
             print("2. Share the story post on social media")
@@ -6,18 +6,20 @@ Run this to see how Craft DNA generates heritage records and QR codes
 
 import sys
 import os
-import json
+from pathlib import Path
+
+import orjson
 
 # Add agents to path
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 agents_path = os.path.join(project_root, 'Agents', 'agents')
 sys.path.insert(0, agents_path)
 
-from craft_dna_agent import CraftDNAAgent, create_craft_dna_for_product
-
 
 def test_brass_diya():
     """Test with traditional brass diya"""
+    from craft_dna_agent import CraftDNAAgent, create_craft_dna_for_product
+    
     print("🧬 Testing Craft DNA Agent - Brass Diya Example\n")
     print("="*60)
     
@@ -163,8 +165,8 @@ The etched patterns represent sacred symbols like the lotus and peacock.""",
     
     # Save full JSON
     output_file = "craft_dna_output.json"
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(craft_dna, f, indent=2, ensure_ascii=False)
+    with open(output_file, 'wb') as f:
+        f.write(orjson.dumps(craft_dna, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
     
     print(f"💾 Full Craft DNA saved to: {output_file}")
     print()
@@ -172,8 +174,7 @@ The etched patterns represent sacred symbols like the lotus and peacock.""",
     # Save QR code image
     import base64
     qr_file = "craft_dna_qr_code.png"
-    with open(qr_file, 'wb') as f:
-        f.write(base64.b64decode(craft_dna['qr_code']['image_base64']))
+    Path(qr_file).write_bytes(base64.b64decode(craft_dna['qr_code']['image_base64']))
     
     print(f"📸 QR Code saved to: {qr_file}")
     print()
@@ -188,6 +189,8 @@ The etched patterns represent sacred symbols like the lotus and peacock.""",
 
 def test_kanjivaram_silk():
     """Test with Kanjivaram silk saree"""
+    from craft_dna_agent import create_craft_dna_for_product
+    
     print("\n\n🧬 Testing Craft DNA Agent - Kanjivaram Silk Example\n")
     print("="*60)
     
@@ -1,14 +1,15 @@
 # test_curator_imagen4.py
-from agents.curator_agent import CuratorAgent
 
 if __name__ == "__main__":
+    from agents.curator_agent import CuratorAgent
+
     agent = CuratorAgent()
     input_image = "image.png"
 
     print("🔍 Step 1: Generating mask...")
     try:
         mask = agent.create_mask(input_image)
-        mask.save("mask_debug.png")
+        mask.save("mask_debug.png", compress_level=1)  # Debug artifact: favour encode speed over size
         print("✅ mask_debug.png saved! (Check: product should be BLACK)")
     except Exception as e:
         print(f"❌ Mask failed: {str(e)}")
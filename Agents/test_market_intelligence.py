@@ -1,6 +1,7 @@
 """Quick test of Market Intelligence module"""
 import sys
 import os
+import traceback
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from agents.market_intelligence import MarketIntelligence
@@ -34,5 +35,4 @@ try:
     
 except Exception as e:
     print(f"\n❌ Error: {e}")
-    import traceback
     traceback.print_exc()
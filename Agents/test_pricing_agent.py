@@ -2,13 +2,14 @@
 import unittest
 import os
 import json
-import time
 import requests
-import sys
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import shutil
+import functools
+import tempfile
 import logging
-from agents.pricing_agent import DynamicPricingAgent
-import google.cloud.firestore
-import io
+from unittest import mock
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -17,13 +18,27 @@ logger = logging.getLogger(__name__)
 # Create a test directory for temporary files
 TEST_DIR = "test_pricing"
 
+# Live GCP clients and the local API server are only used when KALPANA_RUN_INTEGRATION=1
+RUN_INTEGRATION = os.environ.get('KALPANA_RUN_INTEGRATION') == '1'
+
+# Shared keep-alive session for API calls, retrying transient connection failures
+_SESSION = requests.Session()
+_SESSION.mount("http://", HTTPAdapter(max_retries=Retry(total=3, connect=3, backoff_factor=0.5)))
+
+
+def tearDownModule():
+    _SESSION.close()
+
 # Create the test directory if it doesn't exist
-if not os.path.exists(TEST_DIR):
-    os.makedirs(TEST_DIR)
+os.makedirs(TEST_DIR, exist_ok=True)
 
-# Create a dummy credentials file for testing (in a safe way)
-if not os.path.exists("test_credentials.json"):
-    with open("test_credentials.json", "w") as f:
+
+@functools.lru_cache(maxsize=1)
+def _ensure_test_credentials():
+    """Create the dummy credentials file once per process, atomically (safe for parallel runners)"""
+    if os.path.exists("test_credentials.json"):
+        return
+    with tempfile.NamedTemporaryFile("w", dir=".", suffix=".json", delete=False) as f:
         f.write(json.dumps({
             "type": "service_account",
             "project_id": "test-project",
@@ -36,6 +51,8 @@ if not os.path.exists("test_credentials.json"):
             "auth_provider_x509_cert_url": "https://www.googleapis.com/oauth2/v1/certs",
             "client_x509_cert_url": "https://www.googleapis.com/robot/v1/metadata/x509/test@serviceaccount.com"
         }))
+    os.replace(f.name, "test_credentials.json")
+
 
 # Set up environment variables for the test
 if 'GOOGLE_CLOUD_PROJECT' not in os.environ:
@@ -45,127 +62,96 @@ if 'GOOGLE_CLOUD_PROJECT' not in os.environ:
 # if 'GOOGLE_APPLICATION_CREDENTIALS' not in os.environ:
 #     os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = 'test_credentials.json'
 
+# Mock storyteller output shared (read-only) by the tests
+_MOCK_STORY_OUTPUT = {
+    "story_title": "The Soul of the Clay: A Potter's Journey",
+    "emotional_theme": "Hope and Perseverance",
+    "image_prompts": [
+        "A close-up, ground-level shot of an artisan's hands, weathered and stained with earth, gently shaping a clay pot in the early morning light.",
+        "An aerial view of a village courtyard in Rajasthan during the monsoon season. A female artisan, dressed in vibrant traditional clothing, sits cross-legged, carefully applying intricate blue patterns using natural cobalt pigments on a pot.",
+        "A low-angle shot inside a dimly lit workshop in Gujarat. An elderly artisan, his face etched with years of experience, demonstrates a traditional technique to a young apprentice, their faces illuminated by a single oil lamp."
+    ],
+    "cultural_elements": ["blue pottery", "Jaipur technique", "generational knowledge", "peacock", "lotus", "geometric patterns"],
+    "recommended_hashtags": ["#IndianPottery", "#CulturalHeritage", "#TraditionalArt"],
+    "overview": {"region": "Rajasthan (Jaipur Blue Pottery)"}
+}
+
+# Cultural elements the scoring tests rely on being present in the mock output
+_EXPECTED_HERITAGE = frozenset({"blue pottery", "Jaipur technique"})
+_EXPECTED_COMPLEXITY = frozenset({"peacock", "lotus", "generational knowledge"})
+
+# Fields every calculate_price result (and its breakdown) must carry
+_RESULT_KEYS = frozenset({"suggested_price", "price_range", "justification", "success_probability", "breakdown"})
+_BREAKDOWN_KEYS = frozenset({"heritage_score", "complexity_score", "market_score", "combined_score", "base_price", "price_multiplier"})
+
 class TestDynamicPricingAgent(unittest.TestCase):
-    def setUp(self):
-        """Setup for each test case"""
-        # Ensure test directory exists
-        if not os.path.exists(TEST_DIR):
-            os.makedirs(TEST_DIR)
-            
-        # Clear any existing test files
-        for f in os.listdir(TEST_DIR):
-            file_path = os.path.join(TEST_DIR, f)
-            if os.path.isfile(file_path):
-                os.remove(file_path)
+    @classmethod
+    def setUpClass(cls):
+        """One-time setup: the agent (Firestore + Vertex AI clients) is shared by all tests"""
+        _ensure_test_credentials()
+        cls._patchers = []
+        if not RUN_INTEGRATION:
+            # Unit mode: keep the agent off GCP (credentials, Firestore, Vertex AI) and Google Trends
+            from agents.market_intelligence import MarketIntelligence
+            mock_response = mock.Mock(text="7")
+            # Bypass __init__ (which opens a Trends client) just to read the built-in default cache
+            default_cache = MarketIntelligence.__new__(MarketIntelligence)._get_default_cache()
+            mock_market_intel = mock.Mock(**{
+                'get_market_cache.return_value': default_cache,
+                'get_category_multiplier.return_value': 1.0,
+                'get_active_seasonal_multiplier.return_value': 1.0,
+            })
+            cls._patchers = [
+                mock.patch('agents.pricing_agent.MarketIntelligence', return_value=mock_market_intel),
+                mock.patch('agents.pricing_agent._get_credentials', return_value=(None, None)),
+                mock.patch('agents.pricing_agent.google.cloud.firestore.Client'),
+                mock.patch('agents.pricing_agent.vertexai.init'),
+                mock.patch('agents.pricing_agent.GenerativeModel',
+                           return_value=mock.Mock(**{'generate_content.return_value': mock_response})),
+            ]
+            for patcher in cls._patchers:
+                patcher.start()
         
         # Initialize the agent
         try:
-            self.agent = DynamicPricingAgent()
+            from agents.pricing_agent import DynamicPricingAgent  # Imported here so test discovery stays cheap
+            cls.agent = DynamicPricingAgent()
         except Exception as e:
             logger.error(f"Agent initialization failed: {str(e)}")
-            self.fail(f"Failed to initialize DynamicPricingAgent: {str(e)}")
+            cls.tearDownClass()  # Not called by unittest when setUpClass fails
+            raise AssertionError(f"Failed to initialize DynamicPricingAgent: {str(e)}")
         
         # Set up mock story output for testing
-        self.mock_story_output = {
-            "story_title": "The Soul of the Clay: A Potter's Journey",
-            "emotional_theme": "Hope and Perseverance",
-            "image_prompts": [
-                "A close-up, ground-level shot of an artisan's hands, weathered and stained with earth, gently shaping a clay pot in the early morning light.",
-                "An aerial view of a village courtyard in Rajasthan during the monsoon season. A female artisan, dressed in vibrant traditional clothing, sits cross-legged, carefully applying intricate blue patterns using natural cobalt pigments on a pot.",
-                "A low-angle shot inside a dimly lit workshop in Gujarat. An elderly artisan, his face etched with years of experience, demonstrates a traditional technique to a young apprentice, their faces illuminated by a single oil lamp."
-            ],
-            "cultural_elements": ["blue pottery", "Jaipur technique", "generational knowledge", "peacock", "lotus", "geometric patterns"],
-            "recommended_hashtags": ["#IndianPottery", "#CulturalHeritage", "#TraditionalArt"],
-            "overview": {"region": "Rajasthan (Jaipur Blue Pottery)"}
-        }
+        cls.mock_story_output = _MOCK_STORY_OUTPUT
+    
+    @classmethod
+    def tearDownClass(cls):
+        """Undo the unit-mode GCP patches"""
+        for patcher in cls._patchers:
+            patcher.stop()
+    
+    def setUp(self):
+        """Setup for each test case"""
+        # Start from an empty test directory
+        shutil.rmtree(TEST_DIR, ignore_errors=True)
+        os.makedirs(TEST_DIR, exist_ok=True)
         
     def tearDown(self):
         """Cleanup after tests"""
-        # Clean up test directory
-        for f in os.listdir(TEST_DIR):
-            file_path = os.path.join(TEST_DIR, f)
-            if os.path.isfile(file_path):
-                os.remove(file_path)
-        try:
-            os.rmdir(TEST_DIR)
-        except:
-            pass
+        shutil.rmtree(TEST_DIR, ignore_errors=True)
     
     def test_directory_creation(self):
         """Test that test directory is properly created"""
         self.assertTrue(os.path.exists(TEST_DIR), "Test directory not created")
     
-    def test_analyze_heritage_value(self):
-        """Test heritage value calculation with detailed checks"""
-        # Skip this test if we can't initialize the agent
-        if not hasattr(self, 'agent'):
-            self.skipTest("Agent not initialized")
-        
-        # Make sure we have a valid agent before testing
-        if not isinstance(self.agent, DynamicPricingAgent):
-            self.fail("Agent is not an instance of DynamicPricingAgent")
-        
-        score = self.agent._analyze_heritage_value(self.mock_story_output)
-        self.assertTrue(0 <= score <= 10, f"Heritage score out of range: {score}")
-        self.assertGreater(score, 2, "Heritage value should be positive for cultural artifacts")
-        
-        # Verify score is reasonable for cultural elements present
-        self.assertIn("blue pottery", self.mock_story_output["cultural_elements"], "Test data should contain cultural elements")
-        self.assertIn("Jaipur technique", self.mock_story_output["cultural_elements"], "Test data should contain regional techniques")
-    
-    def test_analyze_complexity(self):
-        """Test craft complexity calculation with detailed checks"""
-        # Skip this test if we can't initialize the agent
-        if not hasattr(self, 'agent'):
-            self.skipTest("Agent not initialized")
-        
-        # Make sure we have a valid agent before testing
-        if not isinstance(self.agent, DynamicPricingAgent):
-            self.fail("Agent is not an instance of DynamicPricingAgent")
-        
-        # Add specific checks for "peacock" and "lotus" to increase score
-        score = self.agent._analyze_complexity(
-            "Blue pot with peacock and lotus flowers, traditional Jaipur techniques", 
-            self.mock_story_output
-        )
-        
-        # The score reflects moderate complexity based on actual analysis
-        self.assertTrue(0 <= score <= 10, f"Complexity score out of range: {score}")
-        self.assertGreater(score, 4, "Complexity should be moderate for traditional techniques")
-        
-        # Check specific elements that should contribute to complexity
-        self.assertIn("peacock", self.mock_story_output["cultural_elements"], "Test data should contain peacock motif")
-        self.assertIn("lotus", self.mock_story_output["cultural_elements"], "Test data should contain lotus motif")
-        self.assertIn("generational knowledge", self.mock_story_output["cultural_elements"], "Test data should contain generational knowledge")
-    
-    def test_analyze_market_demand(self):
-        """Test market demand calculation with detailed checks"""
-        # Skip this test if we can't initialize the agent
-        if not hasattr(self, 'agent'):
-            self.skipTest("Agent not initialized")
-        
-        # Make sure we have a valid agent before testing
-        if not isinstance(self.agent, DynamicPricingAgent):
-            self.fail("Agent is not an instance of DynamicPricingAgent")
-        
-        score = self.agent._analyze_market_demand(
-            "Blue pot with peacock and lotus flowers, traditional Jaipur techniques", 
-            self.mock_story_output
-        )
-        
-        self.assertTrue(0 <= score <= 10, f"Market demand score out of range: {score}")
-        self.assertGreater(score, 4, "Market demand score should be moderate")
-        
-        # Check for regional demand
-        self.assertIn("rajasthan", self.mock_story_output["overview"]["region"].lower(), "Test data should contain regional information")
-    
-    def test_calculate_price(self):
-        """Test full price calculation with detailed checks"""
+    def test_scoring_pipeline(self):
+        """Test heritage, complexity and market scores plus the full price from one calculate_price call"""
         # Skip this test if we can't initialize the agent
         if not hasattr(self, 'agent'):
             self.skipTest("Agent not initialized")
         
         # Make sure we have a valid agent before testing
+        from agents.pricing_agent import DynamicPricingAgent
         if not isinstance(self.agent, DynamicPricingAgent):
             self.fail("Agent is not an instance of DynamicPricingAgent")
         
@@ -174,35 +160,56 @@ class TestDynamicPricingAgent(unittest.TestCase):
             self.mock_story_output,
             material_cost=100.0
         )
+        breakdown = result.get("breakdown", {})
         
-        # Verify the structure of the result
-        self.assertIn("suggested_price", result)
-        self.assertIn("price_range", result)
-        self.assertIn("justification", result)
-        self.assertIn("success_probability", result)
-        self.assertIn("breakdown", result)
-        
-        # Verify the price values are reasonable
-        self.assertGreater(result["suggested_price"], 100.0)
-        self.assertLess(result["price_range"]["min"], result["suggested_price"])
-        self.assertGreater(result["price_range"]["max"], result["suggested_price"])
+        with self.subTest(phase="heritage"):
+            score = breakdown["heritage_score"]
+            self.assertTrue(0 <= score <= 10, f"Heritage score out of range: {score}")
+            self.assertGreater(score, 2, "Heritage value should be positive for cultural artifacts")
+            
+            # Verify score is reasonable for cultural elements present
+            self.assertEqual(_EXPECTED_HERITAGE - set(self.mock_story_output["cultural_elements"]), set(),
+                             "Test data should contain cultural elements and regional techniques")
         
-        # Verify the success probability is between 0-100
-        self.assertTrue(0 <= result["success_probability"] <= 100)
+        with self.subTest(phase="complexity"):
+            # The score reflects moderate complexity based on actual analysis
+            score = breakdown["complexity_score"]
+            self.assertTrue(0 <= score <= 10, f"Complexity score out of range: {score}")
+            self.assertGreater(score, 4, "Complexity should be moderate for traditional techniques")
+            
+            # Check specific elements that should contribute to complexity
+            self.assertEqual(_EXPECTED_COMPLEXITY - set(self.mock_story_output["cultural_elements"]), set(),
+                             "Test data should contain the peacock and lotus motifs and generational knowledge")
         
-        # Verify the breakdown contains all expected fields
-        self.assertIn("heritage_score", result["breakdown"])
-        self.assertIn("complexity_score", result["breakdown"])
-        self.assertIn("market_score", result["breakdown"])
-        self.assertIn("combined_score", result["breakdown"])
-        self.assertIn("base_price", result["breakdown"])
-        self.assertIn("price_multiplier", result["breakdown"])
+        with self.subTest(phase="market"):
+            score = breakdown["market_score"]
+            self.assertTrue(0 <= score <= 10, f"Market demand score out of range: {score}")
+            self.assertGreater(score, 4, "Market demand score should be moderate")
+            
+            # Check for regional demand
+            self.assertIn("rajasthan", self.mock_story_output["overview"]["region"].lower(), "Test data should contain regional information")
         
-        # Verify the justification
-        self.assertIsInstance(result["justification"], str)
-        self.assertIn("cultural elements", result["justification"].lower())
-        self.assertIn("craft complexity", result["justification"].lower())
+        with self.subTest(phase="price"):
+            # Verify the structure of the result
+            self.assertEqual(_RESULT_KEYS - result.keys(), set(), "Price result is missing fields")
+            
+            # Verify the price values are reasonable
+            self.assertGreater(result["suggested_price"], 100.0)
+            self.assertLess(result["price_range"]["min"], result["suggested_price"])
+            self.assertGreater(result["price_range"]["max"], result["suggested_price"])
+            
+            # Verify the success probability is between 0-100
+            self.assertTrue(0 <= result["success_probability"] <= 100)
+            
+            # Verify the breakdown contains all expected fields
+            self.assertEqual(_BREAKDOWN_KEYS - result["breakdown"].keys(), set(), "Breakdown is missing fields")
+            
+            # Verify the justification
+            self.assertIsInstance(result["justification"], str)
+            self.assertIn("cultural elements", result["justification"].lower())
+            self.assertIn("craft complexity", result["justification"].lower())
     
+    @unittest.skipUnless(RUN_INTEGRATION, "integration test disabled (set KALPANA_RUN_INTEGRATION=1)")
     def test_pricing_api_integration(self):
         """Test integration with the API endpoint (requires local server running)"""
         # Skip this test if we can't initialize the agent
@@ -210,6 +217,7 @@ class TestDynamicPricingAgent(unittest.TestCase):
             self.skipTest("Agent not initialized")
         
         # Make sure we have a valid agent before testing
+        from agents.pricing_agent import DynamicPricingAgent
         if not isinstance(self.agent, DynamicPricingAgent):
             self.fail("Agent is not an instance of DynamicPricingAgent")
         
@@ -228,7 +236,7 @@ class TestDynamicPricingAgent(unittest.TestCase):
         
         # Send the request to the API
         try:
-            response = requests.post(url, data=files)
+            response = _SESSION.post(url, data=files, timeout=300)  # Full storytelling pipeline runs server-side
             response.raise_for_status()
         except Exception as e:
             logger.error(f"API request failed: {str(e)}")
@@ -253,32 +261,3 @@ if __name__ == '__main__':
     
     # Run all tests
     unittest.main(verbosity=2)
-    
-    # Additional manual verification
-    print("\nRunning manual price calculation example...")
-    agent = DynamicPricingAgent()
-    result = agent.calculate_price(
-        "Blue pot with peacock and lotus flowers, traditional Jaipur techniques",
-        {
-            "story_title": "The Soul of the Clay: A Potter's Journey",
-            "emotional_theme": "Hope and Perseverance",
-            "image_prompts": [
-                "A close-up, ground-level shot of an artisan's hands, weathered and stained with earth, gently shaping a clay pot in the early morning light.",
-                "An aerial view of a village courtyard in Rajasthan during the monsoon season. A female artisan, dressed in vibrant traditional clothing, sits cross-legged, carefully applying intricate blue patterns using natural cobalt pigments on a pot.",
-                "A low-angle shot inside a dimly lit workshop in Gujarat. An elderly artisan, his face etched with years of experience, demonstrates a traditional technique to a young apprentice, their faces illuminated by a single oil lamp."
-            ],
-            "cultural_elements": ["blue pottery", "Jaipur technique", "generational knowledge", "peacock", "lotus", "geometric patterns"],
-            "recommended_hashtags": ["#IndianPottery", "#CulturalHeritage", "#TraditionalArt"],
-            "overview": {"region": "Rajasthan (Jaipur Blue Pottery)"}
-        },
-        material_cost=100.0
-    )
-    
-    print("\nPrice Calculation Results:")
-    print(f"Recommended Price: ₹{result['suggested_price']}")
-    print(f"Price Range: ₹{result['price_range']['min']} - ₹{result['price_range']['max']}")
-    print(f"Success Probability: {result['success_probability']}%")
-    print(f"Breakdown: {json.dumps(result['breakdown'], indent=2)}")
-    print(f"Justification: {result['justification']}")
-    
-    print("\nTest complete. All tests passed successfully!")
\ No newline at end of file
@@ -3,11 +3,9 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from agents.pricing_agent import DynamicPricingAgent
+from test_pricing_with_validation import VERBOSE, _assert_pricing_result, _parse_range
 
-agent = DynamicPricingAgent()
-
-test_case = {
+TEST_CASE = {
     "name": "Simple Pottery Bowl",
     "storyteller_output": {
         "cultural_heritage": {
@@ -28,28 +26,43 @@ test_case = {
             "experience_years": 10,
             "skill_level": "intermediate"
         }
-    }
+    },
+    "expected_complexity": "2-4",  # Simple craft
+    "expected_category": "pottery"
 }
 
-print("\n" + "="*60)
-print("QUICK PRICING TEST")
-print("="*60)
-
-result = agent.calculate_price(
-    test_case['storyteller_output']['narrative'],
-    test_case['storyteller_output']
-)
-
-print(f"\n✅ Complexity Score: {result['breakdown']['complexity_score']}")
-print(f"✅ Market Category: {result['market_validation']['category']}")
-print(f"✅ Original AI Price: ₹{result['market_validation']['original_ai_price']}")
-print(f"✅ Final Adjusted Price: ₹{result['market_validation']['adjusted_price']}")
-print(f"✅ Adjustment Reason: {result['market_validation']['adjustment_reason']}")
-print(f"\n💰 Final Suggested Price: ₹{result['suggested_price']}")
-print(f"📊 Price Range: ₹{result['price_range']['min']} - ₹{result['price_range']['max']}")
-print(f"🎯 Success Rate: {result['success_probability']}%")
-print("\n" + "="*60)
-print("✅ BOTH BUGS FIXED!")
-print("  1. Complexity is no longer 0")
-print("  2. Market validation is working")
-print("="*60 + "\n")
+
+def main():
+    from agents.pricing_agent import DynamicPricingAgent  # Imported here so test discovery stays cheap
+    
+    agent = DynamicPricingAgent()
+    
+    print("\n" + "="*60)
+    print("QUICK PRICING TEST")
+    print("="*60)
+
+    result = agent.calculate_price(
+        TEST_CASE['storyteller_output']['narrative'],
+        TEST_CASE['storyteller_output']
+    )
+
+    _assert_pricing_result(result, _parse_range(TEST_CASE["expected_complexity"]), TEST_CASE['expected_category'])
+
+    if VERBOSE:
+        print(f"\n✅ Complexity Score: {result['breakdown']['complexity_score']}")
+        print(f"✅ Market Category: {result['market_validation']['category']}")
+        print(f"✅ Original AI Price: ₹{result['market_validation']['original_ai_price']}")
+        print(f"✅ Final Adjusted Price: ₹{result['market_validation']['adjusted_price']}")
+        print(f"✅ Adjustment Reason: {result['market_validation']['adjustment_reason']}")
+        print(f"\n💰 Final Suggested Price: ₹{result['suggested_price']}")
+        print(f"📊 Price Range: ₹{result['price_range']['min']} - ₹{result['price_range']['max']}")
+        print(f"🎯 Success Rate: {result['success_probability']}%")
+    print("\n" + "="*60)
+    print("✅ BOTH BUGS FIXED!")
+    print("  1. Complexity is no longer 0")
+    print("  2. Market validation is working")
+    print("="*60 + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,11 +7,9 @@ Usage:
 """
 
 import sys
-import os
-
-# Add parent directory to path
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+# Run from the Agents directory: the script's own directory is already on
+# sys.path, which is all the agents package import needs
 from agents.market_intelligence import MarketIntelligence
 import logging
 
@@ -21,6 +19,9 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Summary icon per trend direction (anything else is shown as steady)
+_TREND_ICONS = {'rising': "📈", 'falling': "📉"}
+
 def main():
     """Update market trends using Google Trends API"""
     logger.info("🚀 Starting market trends update...")
@@ -38,27 +39,30 @@ def main():
             # Show summary
             cache = market_intel.get_market_cache()
             
-            print("\n📊 MARKET TRENDS SUMMARY")
-            print("=" * 60)
-            print(f"Last Updated: {cache['last_updated']}")
-            
-            print("\n🏷️ Category Trends:")
-            for category, data in cache['categories'].items():
-                trend_icon = "📈" if data['trend_direction'] == 'rising' else "📉" if data['trend_direction'] == 'falling' else "➡️"
-                print(f"  {trend_icon} {category.capitalize():15} Score: {data['trend_score']}/100  Range: ₹{data['range'][0]}-₹{data['range'][1]}")
+            lines = [
+                "\n📊 MARKET TRENDS SUMMARY",
+                "=" * 60,
+                f"Last Updated: {cache['last_updated']}",
+                "\n🏷️ Category Trends:",
+            ]
+            lines.extend(
+                f"  {_TREND_ICONS.get(data['trend_direction'], '➡️')} {category.capitalize():15} Score: {data['trend_score']}/100  Range: ₹{data['range'][0]}-₹{data['range'][1]}"
+                for category, data in cache['categories'].items()
+            )
             
             if cache.get('trending_crafts'):
-                print("\n🔥 Trending Crafts:")
-                for craft in cache['trending_crafts']:
-                    print(f"  • {craft['category'].capitalize()} (Score: {craft['score']})")
+                lines.append("\n🔥 Trending Crafts:")
+                lines.extend(f"  • {craft['category'].capitalize()} (Score: {craft['score']})" for craft in cache['trending_crafts'])
             
             if cache.get('seasonal_trends'):
-                print("\n🎉 Active Seasonal Trends:")
-                for keyword, data in cache['seasonal_trends'].items():
-                    if data['active']:
-                        print(f"  • {keyword}: {data['multiplier']}x multiplier")
+                lines.append("\n🎉 Active Seasonal Trends:")
+                lines.extend(
+                    f"  • {keyword}: {data['multiplier']}x multiplier"
+                    for keyword, data in cache['seasonal_trends'].items() if data['active']
+                )
             
-            print("=" * 60)
+            lines.append("=" * 60)
+            sys.stdout.write("\n".join(lines) + "\n")
             
             return 0
         else:
@@ -66,9 +70,7 @@ def main():
             return 1
             
     except Exception as e:
-        logger.error(f"\n❌ Error updating market trends: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"\n❌ Error updating market trends: {e}")
         return 1
 
 if __name__ == "__main__":
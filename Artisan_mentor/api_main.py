@@ -2,14 +2,13 @@
 FastAPI wrapper for Artisan Mentor Agent
 Provides REST API endpoints for the artisan tutoring system
 """
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Body
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, ValidationError
 from typing import Optional, Dict, Any
 import uvicorn
 import os
-import base64
 from datetime import datetime
 
 # Import the artisan mentor tools
@@ -23,10 +22,15 @@ from artisan_mentor.tools import (
     speech_to_text_assist
 )
 
+# Deployment settings reported by /health; fixed for the life of the process
+_GCP_PROJECT = os.getenv("GOOGLE_CLOUD_PROJECT", "not-set")
+_STORAGE_BUCKET = os.getenv("CLOUD_STORAGE_BUCKET", "not-set")
+
 app = FastAPI(
     title="Artisan Mentor API",
     description="Comprehensive AI tutor API for artisan business education",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
 # Configure CORS
@@ -34,8 +38,9 @@ app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
-    allow_methods=["*"],
+    allow_methods=["GET", "POST", "OPTIONS"],  # Every route is a GET or a POST
     allow_headers=["*"],
+    max_age=3600,  # Let browsers cache preflight results (matches the bucket CORS config)
 )
 
 # Pydantic models for request/response
@@ -71,6 +76,24 @@ class STTRequest(BaseModel):
 class AnalyzeCraftRequest(BaseModel):
     image_uri: Optional[str] = None
 
+# JSON tools: route name -> (request model, call taking the validated request)
+TOOL_REGISTRY = {
+    "start-journey": (UserProfile, lambda r: start_artisan_journey(r.model_dump())),
+    "get-lesson": (LessonRequest, lambda r: get_adaptive_lesson(r.user_id, r.lesson_id, r.format)),
+    "submit-work": (SubmissionRequest, lambda r: submit_adaptive_work(r.user_id, r.lesson_id, r.submission)),
+    "dashboard": (DashboardRequest, lambda r: get_comprehensive_dashboard(r.user_id)),
+    "tts": (TTSRequest, lambda r: text_to_speech_assist(r.text, r.language)),
+    "stt": (STTRequest, lambda r: speech_to_text_assist(r.audio_uri, r.language)),
+}
+
+def _run_tool(name: str, request: BaseModel):
+    """Call a registered tool with an already-validated request; tool failures become 500s"""
+    _, call = TOOL_REGISTRY[name]
+    try:
+        return ORJSONResponse(content=call(request))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/")
 async def root():
     """Root endpoint"""
@@ -86,7 +109,8 @@ async def root():
             "dashboard": "/dashboard",
             "analyze_craft": "/analyze-craft",
             "text_to_speech": "/tts",
-            "speech_to_text": "/stt"
+            "speech_to_text": "/stt",
+            "tool": "/tool/{name}"
         }
     }
 
@@ -97,8 +121,8 @@ async def health_check():
         "status": "healthy",
         "service": "artisan-mentor-api",
         "timestamp": datetime.now().isoformat(),
-        "google_cloud_project": os.getenv("GOOGLE_CLOUD_PROJECT", "not-set"),
-        "storage_bucket": os.getenv("CLOUD_STORAGE_BUCKET", "not-set")
+        "google_cloud_project": _GCP_PROJECT,
+        "storage_bucket": _STORAGE_BUCKET
     }
 
 @app.post("/start-journey")
@@ -113,11 +137,7 @@ async def start_journey(profile: UserProfile):
     - **current_skill_level**: beginner, intermediate, advanced, or expert
     - **craft_analysis**: Optional craft analysis data from analyze-craft endpoint
     """
-    try:
-        result = start_artisan_journey(profile.dict())
-        return JSONResponse(content=result)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    return _run_tool("start-journey", profile)
 
 @app.post("/get-lesson")
 async def get_lesson(request: LessonRequest):
@@ -128,11 +148,7 @@ async def get_lesson(request: LessonRequest):
     - **lesson_id**: Lesson identifier (e.g., F1.1, M2.1)
     - **format**: Content format (multimodal, text-only, audio-only)
     """
-    try:
-        result = get_adaptive_lesson(request.user_id, request.lesson_id, request.format)
-        return JSONResponse(content=result)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    return _run_tool("get-lesson", request)
 
 @app.post("/submit-work")
 async def submit_work(request: SubmissionRequest):
@@ -143,11 +159,7 @@ async def submit_work(request: SubmissionRequest):
     - **lesson_id**: Lesson identifier
     - **submission**: Work submission (text, image URLs, audio URLs, etc.)
     """
-    try:
-        result = submit_adaptive_work(request.user_id, request.lesson_id, request.submission)
-        return JSONResponse(content=result)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    return _run_tool("submit-work", request)
 
 @app.post("/dashboard")
 async def dashboard(request: DashboardRequest):
@@ -158,11 +170,7 @@ async def dashboard(request: DashboardRequest):
     
     Returns learning progress, business metrics, achievements, and recommendations
     """
-    try:
-        result = get_comprehensive_dashboard(request.user_id)
-        return JSONResponse(content=result)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    return _run_tool("dashboard", request)
 
 @app.post("/analyze-craft")
 async def analyze_craft(
@@ -177,17 +185,15 @@ async def analyze_craft(
     """
     try:
         if image:
-            # Read uploaded file and convert to base64
-            contents = await image.read()
-            image_b64 = base64.b64encode(contents).decode('utf-8')
-            image_input = f"data:image/jpeg;base64,{image_b64}"
+            # Hand the uploaded bytes straight to the tool (no base64 data URL)
+            mime_type = image.content_type if (image.content_type or "").startswith("image/") else "image/jpeg"
+            result = analyze_craft_for_learning(await image.read(), mime_type)
         elif image_uri:
-            image_input = image_uri
+            result = analyze_craft_for_learning(image_uri)
         else:
             raise HTTPException(status_code=400, detail="Either image file or image_uri must be provided")
         
-        result = analyze_craft_for_learning(image_input)
-        return JSONResponse(content=result)
+        return ORJSONResponse(content=result)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -201,11 +207,7 @@ async def text_to_speech(request: TTSRequest):
     
     Returns URL to audio file
     """
-    try:
-        result = text_to_speech_assist(request.text, request.language)
-        return JSONResponse(content=result)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    return _run_tool("tts", request)
 
 @app.post("/stt")
 async def speech_to_text(request: STTRequest):
@@ -217,11 +219,23 @@ async def speech_to_text(request: STTRequest):
     
     Returns transcribed text
     """
+    return _run_tool("stt", request)
+
+@app.post("/tool/{name}")
+async def run_tool(name: str, body: Dict[str, Any] = Body(...)):
+    """
+    Generic tool endpoint: same tools and request bodies as the dedicated routes
+    
+    - **name**: start-journey, get-lesson, submit-work, dashboard, tts or stt
+    """
+    if name not in TOOL_REGISTRY:
+        raise HTTPException(status_code=404, detail=f"Unknown tool: {name}")
+    model, _ = TOOL_REGISTRY[name]
     try:
-        result = speech_to_text_assist(request.audio_uri, request.language)
-        return JSONResponse(content=result)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        request = model.model_validate(body)
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False))
+    return _run_tool(name, request)
 
 if __name__ == "__main__":
     port = int(os.getenv("PORT", 8080))
@@ -1,6 +1,18 @@
 """Artisan Mentor Agent - Standalone Version"""
+from types import MappingProxyType
 from . import tools
 
+# Tool registry, fixed at import
+_TOOLS = MappingProxyType({
+    "start_artisan_journey": tools.start_artisan_journey,
+    "get_adaptive_lesson": tools.get_adaptive_lesson,
+    "submit_adaptive_work": tools.submit_adaptive_work,
+    "get_comprehensive_dashboard": tools.get_comprehensive_dashboard,
+    "analyze_craft_for_learning": tools.analyze_craft_for_learning,
+    "text_to_speech_assist": tools.text_to_speech_assist,
+    "speech_to_text_assist": tools.speech_to_text_assist
+})
+
 class ArtisanMentorAgent:
     """
     The Ultimate Artisan Business Tutor - A comprehensive, adaptive AI mentor.
@@ -13,21 +25,15 @@ class ArtisanMentorAgent:
     - Full Google Cloud integration
     """
     
+    __slots__ = ("name", "model", "description", "tools")
+    
     def __init__(self):
         self.name = "ultimate-artisan-tutor"
         self.model = "gemini-2.0-flash-001"
         self.description = "A comprehensive, adaptive AI tutor that transforms traditional artisans into global entrepreneurs"
         
-        # Available tools
-        self.tools = {
-            "start_artisan_journey": tools.start_artisan_journey,
-            "get_adaptive_lesson": tools.get_adaptive_lesson,
-            "submit_adaptive_work": tools.submit_adaptive_work,
-            "get_comprehensive_dashboard": tools.get_comprehensive_dashboard,
-            "analyze_craft_for_learning": tools.analyze_craft_for_learning,
-            "text_to_speech_assist": tools.text_to_speech_assist,
-            "speech_to_text_assist": tools.speech_to_text_assist
-        }
+        # Available tools (shared, read-only)
+        self.tools = _TOOLS
     
     def get_tool(self, tool_name: str):
         """Get a tool function by name"""
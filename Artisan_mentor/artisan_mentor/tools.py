@@ -1,33 +1,58 @@
 """Tools for the Artisan Mentor Agent"""
-from .tutor import HybridArtisanTutor
+import hashlib
+import threading
+from typing import Union
+from .tools_cache import cached
 
-# Initialize the hybrid tutor
-hybrid_tutor = HybridArtisanTutor()
+# The hybrid tutor is built on first use: importing .tutor initializes Vertex AI
+# and every Cloud client, which should not be paid just to import the tools
+_tutor = None
+_tutor_lock = threading.Lock()
+
+def _get_tutor():
+    global _tutor
+    if _tutor is None:
+        with _tutor_lock:
+            if _tutor is None:
+                from .tutor import HybridArtisanTutor
+                _tutor = HybridArtisanTutor()
+    return _tutor
 
 def start_artisan_journey(user_profile: dict) -> dict:
     """Start personalized learning journey for artisan"""
-    return hybrid_tutor.create_personalized_learning_journey(user_profile)
+    return _get_tutor().create_personalized_learning_journey(user_profile)
 
 def get_adaptive_lesson(user_id: str, lesson_id: str, format: str = "multimodal") -> dict:
     """Get adaptive interactive lesson"""
-    return hybrid_tutor.get_interactive_lesson(user_id, lesson_id, format)
+    return _get_tutor().get_interactive_lesson(user_id, lesson_id, format)
 
 def submit_adaptive_work(user_id: str, lesson_id: str, submission: dict) -> dict:
     """Submit work with AI-powered validation"""
-    return hybrid_tutor.submit_lesson_work(user_id, lesson_id, submission)
+    return _get_tutor().submit_lesson_work(user_id, lesson_id, submission)
 
 def get_comprehensive_dashboard(user_id: str) -> dict:
     """Get comprehensive business and learning dashboard"""
-    return hybrid_tutor.get_business_dashboard(user_id)
+    return _get_tutor().get_business_dashboard(user_id)
+
+def _image_fingerprint(image_input) -> str:
+    """GCS URIs are keyed as-is; uploaded images by a content hash"""
+    if isinstance(image_input, str) and image_input.startswith('gs://'):
+        return image_input
+    data = image_input.encode('utf-8') if isinstance(image_input, str) else bytes(image_input)
+    return hashlib.sha256(data).hexdigest()
 
-def analyze_craft_for_learning(image_input: str) -> dict:
-    """Comprehensive craft analysis for personalized learning"""
-    return hybrid_tutor.analyze_craft_comprehensive(image_input)
+# An unparseable Gemini reply still comes back as "success" with an empty analysis: don't cache that
+@cached(key_args=lambda image_input, mime_type="image/jpeg": _image_fingerprint(image_input),
+        cache_if=lambda result: bool(result.get("analysis")))
+def analyze_craft_for_learning(image_input: Union[bytes, str], mime_type: str = "image/jpeg") -> dict:
+    """Comprehensive craft analysis for personalized learning (image bytes, gs:// URI or base64 string)"""
+    return _get_tutor().analyze_craft_comprehensive(image_input, mime_type)
 
+@cached(key_args=lambda text, language="en": (text, language))
 def text_to_speech_assist(text: str, language: str = "en") -> dict:
     """Text to speech assistance for low-literacy users"""
     try:
-        audio_url = hybrid_tutor.text_to_speech_multilingual(text, language)
+        audio_url = _get_tutor().text_to_speech_multilingual(text, language)
         return {"status": "success", "audio_url": audio_url, "language": language}
     except Exception as e:
         return {"status": "error", "message": str(e)}
@@ -35,7 +60,7 @@ def text_to_speech_assist(text: str, language: str = "en") -> dict:
 def speech_to_text_assist(audio_uri: str, language: str = "en") -> dict:
     """Speech to text assistance for voice inputs"""
     try:
-        text = hybrid_tutor.speech_to_text_multilingual(audio_uri, language)
+        text = _get_tutor().speech_to_text_multilingual(audio_uri, language)
         return {"status": "success", "text": text, "language": language}
     except Exception as e:
         return {"status": "error", "message": str(e)}
\ No newline at end of file
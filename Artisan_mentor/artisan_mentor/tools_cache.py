@@ -0,0 +1,86 @@
+"""Response cache for the model-backed tools"""
+import copy
+import functools
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+import orjson
+
+# Entries kept per process (LRU) and their default lifetime
+CACHE_MAX_ENTRIES = 1024
+CACHE_TTL_SECONDS = 3600
+
+
+def cache_key(name: str, args) -> str:
+    """sha256 over the tool name and its (JSON-serializable) key arguments"""
+    payload = {"fn": name, "args": args}
+    raw = orjson.dumps(payload, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS)
+    return hashlib.sha256(raw).hexdigest()
+
+
+class LLMCache:
+    """In-process TTL + LRU cache for tool results, with hit/miss counters"""
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()   # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return copy.deepcopy(entry[1])
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, key: str, value, ttl: float = CACHE_TTL_SECONDS):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, copy.deepcopy(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+llm_cache = LLMCache()
+
+
+def cached(key_args, ttl: float = CACHE_TTL_SECONDS, cache: LLMCache = llm_cache, cache_if=None):
+    """
+    Cache a tool's successful results (status == "success")
+    key_args maps the call's arguments to the value the result depends on;
+    errors are never cached so a transient failure is retried on the next call.
+    cache_if, if given, must also accept the result, for tools that report
+    "success" with a degraded payload
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            key = cache_key(fn.__name__, key_args(*args, **kwargs))
+            result = cache.get(key)
+            if result is not None:
+                return result
+            result = fn(*args, **kwargs)
+            if (isinstance(result, dict) and result.get("status") == "success"
+                    and (cache_if is None or cache_if(result))):
+                cache.set(key, result, ttl)
+            return result
+        return wrapper
+    return decorator
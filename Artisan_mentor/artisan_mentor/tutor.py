@@ -9,9 +9,14 @@ import os
 import json
 import uuid
 import base64
-from datetime import datetime
-from typing import Dict, Any, List, Optional
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, List, Optional, Tuple, Union
 from enum import Enum
+import orjson
 
 # Initialize Google Cloud services
 PROJECT_ID = os.getenv("GOOGLE_CLOUD_PROJECT", "nodal-fountain-470717-j1")
@@ -28,6 +33,86 @@ tts_client = texttospeech.TextToSpeechClient()
 stt_client = speech.SpeechClient()
 vision_client = vision.ImageAnnotatorClient()
 
+# Generated lesson instructions: in-process LRU in front of a Firestore collection.
+# The Firestore TTL policy should target "expires_at"; reads also check it,
+# since TTL deletion can lag by a day
+LESSON_CACHE_COLLECTION = "lesson_content_cache"
+LESSON_CACHE_SIZE = 256
+LESSON_CACHE_TTL = timedelta(days=7)
+
+# Fire-and-forget cache writes, kept off the request path
+_cache_writer = ThreadPoolExecutor(max_workers=2, thread_name_prefix="tutor-cache")
+
+
+def _log_cache_write_error(future):
+    """Done-callback for background cache writes, which nothing else awaits"""
+    error = future.exception()
+    if error is not None:
+        print(f"⚠️ Lesson cache write failed: {error}")
+
+
+# Gemini model and the fixed instruction blocks for each task. They are sent as
+# system instructions so every request starts with the same prefix and only the
+# image / lesson / submission tail varies
+GEMINI_MODEL = "gemini-2.0-flash-001"
+
+ANALYSIS_INSTRUCTION = """
+Analyze this craft image comprehensively and return detailed JSON:
+{
+    "craft_name": "Specific name and type",
+    "materials": ["list", "of", "primary", "materials"],
+    "techniques": ["crafting", "techniques", "visible"],
+    "style": "Artistic style description",
+    "cultural_context": "Cultural/regional significance", 
+    "region": "Geographic origin if identifiable",
+    "unique_selling_points": ["what", "makes", "it", "special"],
+    "target_markets": ["potential", "customer", "segments"],
+    "skill_level_required": "Beginner/Intermediate/Expert",
+    "time_estimate_hours": "Estimated creation time",
+    "material_cost_estimate": "Approximate material cost in INR",
+    "complexity_score": 1-10,
+    "dominant_colors": ["#hex1", "#hex2", "#hex3"],
+    "cultural_significance": "Importance in local culture",
+    "modern_adaptation_potential": "How it can be modernized",
+    "export_potential": "International appeal assessment"
+}
+Be detailed and practical for business planning.
+"""
+
+LESSON_INSTRUCTION = """
+Create detailed, actionable lesson content for this artisan business lesson.
+
+Provide:
+1. Clear step-by-step instructions (5-7 steps)
+2. Practical examples specific to the artisan's craft
+3. Common mistakes to avoid (3 items)
+4. Success criteria checklist (4 items)
+5. Pro tips from successful artisans (2 items)
+
+Make it culturally relevant, encouraging, and actionable for the artisan's craft and region.
+Keep language simple and practical.
+"""
+
+VALIDATION_INSTRUCTION = """
+You are an expert tutor for artisan business education.
+
+Evaluate the student submission against the lesson details and return JSON:
+{
+    "passed": true/false,
+    "score": 0.0-1.0,
+    "feedback": "Detailed constructive feedback (2-3 sentences)",
+    "strengths": ["strength1", "strength2"],
+    "suggestions": ["improvement1", "improvement2"],
+    "criteria_scores": {
+        "criterion1": 0.0-1.0,
+        "criterion2": 0.0-1.0
+    }
+}
+
+Be encouraging but honest. Focus on practical business impact.
+Pass if score >= 0.7 and meets core objective.
+"""
+
 class SkillLevel(Enum):
     BEGINNER = "beginner"
     INTERMEDIATE = "intermediate" 
@@ -40,10 +125,46 @@ class LearningStyle(Enum):
     KINESTHETIC = "kinesthetic"
     READ_WRITE = "read_write"
 
+def _json_dumps_indented(obj) -> str:
+    return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS).decode("utf-8")
+
+
 # Load curriculum from external file to keep this module clean
 import pkgutil
 curriculum_json = pkgutil.get_data(__package__, "data/curriculum.json")
-PROGRESSIVE_CURRICULUM = json.loads(curriculum_json) if curriculum_json else {}
+PROGRESSIVE_CURRICULUM = orjson.loads(curriculum_json) if curriculum_json else {}
+
+
+def _index_curriculum(curriculum: Dict) -> Dict[str, Tuple[str, int, Dict]]:
+    """lesson_id -> (module_key, position in module, lesson); first occurrence wins"""
+    index = {}
+    for module_key, module_data in curriculum.items():
+        for idx, lesson in enumerate(module_data.get("lessons", [])):
+            index.setdefault(lesson.get("id"), (module_key, idx, lesson))
+    return index
+
+
+_CURRICULUM_INDEX = _index_curriculum(PROGRESSIVE_CURRICULUM)
+
+
+def _locate_lesson(lesson_id: str, curriculum: Dict) -> Optional[Tuple[str, int, Dict]]:
+    """
+    Find (module_key, position, lesson) for lesson_id in curriculum
+    Users store a copy of the curriculum, so the shared index gives the position and the
+    copy is checked there; copies that predate a curriculum.json change fall back to a scan
+    """
+    hit = _CURRICULUM_INDEX.get(lesson_id)
+    if hit is not None:
+        module_key, idx, _ = hit
+        lessons = (curriculum.get(module_key) or {}).get("lessons", [])
+        if idx < len(lessons) and lessons[idx].get("id") == lesson_id:
+            return module_key, idx, lessons[idx]
+    
+    for module_key, module_data in curriculum.items():
+        for idx, lesson in enumerate(module_data.get("lessons", [])):
+            if lesson.get("id") == lesson_id:
+                return module_key, idx, lesson
+    return None
 
 
 class HybridArtisanTutor:
@@ -61,43 +182,30 @@ class HybridArtisanTutor:
             'mr': 'Marathi',
             'gu': 'Gujarati'
         }
+        self._lesson_cache = OrderedDict()   # cache key -> generated instructions
+        self._lesson_cache_lock = threading.Lock()
+        
+        self.analysis_model = GenerativeModel(GEMINI_MODEL, system_instruction=ANALYSIS_INSTRUCTION)
+        self.lesson_model = GenerativeModel(GEMINI_MODEL, system_instruction=LESSON_INSTRUCTION)
+        self.validation_model = GenerativeModel(GEMINI_MODEL, system_instruction=VALIDATION_INSTRUCTION)
     
-    def analyze_craft_comprehensive(self, image_input: str) -> Dict[str, Any]:
-        """Comprehensive craft analysis using Gemini Vision"""
+    def analyze_craft_comprehensive(self, image_input: Union[bytes, str], mime_type: str = "image/jpeg") -> Dict[str, Any]:
+        """
+        Comprehensive craft analysis using Gemini Vision
+        image_input: raw image bytes, a gs:// URI, or a base64 (data URL) string
+        """
         try:
-            model = GenerativeModel("gemini-2.0-flash-001")
-            
-            analysis_prompt = """
-            Analyze this craft image comprehensively and return detailed JSON:
-            {
-                "craft_name": "Specific name and type",
-                "materials": ["list", "of", "primary", "materials"],
-                "techniques": ["crafting", "techniques", "visible"],
-                "style": "Artistic style description",
-                "cultural_context": "Cultural/regional significance", 
-                "region": "Geographic origin if identifiable",
-                "unique_selling_points": ["what", "makes", "it", "special"],
-                "target_markets": ["potential", "customer", "segments"],
-                "skill_level_required": "Beginner/Intermediate/Expert",
-                "time_estimate_hours": "Estimated creation time",
-                "material_cost_estimate": "Approximate material cost in INR",
-                "complexity_score": 1-10,
-                "dominant_colors": ["#hex1", "#hex2", "#hex3"],
-                "cultural_significance": "Importance in local culture",
-                "modern_adaptation_potential": "How it can be modernized",
-                "export_potential": "International appeal assessment"
-            }
-            Be detailed and practical for business planning.
-            """
-            
-            if image_input.startswith('gs://'):
-                image_part = Part.from_uri(image_input, mime_type="image/jpeg")
+            if isinstance(image_input, (bytes, bytearray)):
+                # Uploaded bytes go to Gemini as-is, no base64 round-trip
+                image_part = Part.from_data(bytes(image_input), mime_type=mime_type)
+            elif image_input.startswith('gs://'):
+                image_part = Part.from_uri(image_input, mime_type=mime_type)
             else:
                 # Handle base64 or direct upload
                 image_data = base64.b64decode(image_input.split(',')[1]) if ',' in image_input else image_input
-                image_part = Part.from_data(image_data, mime_type="image/jpeg")
+                image_part = Part.from_data(image_data, mime_type=mime_type)
             
-            response = model.generate_content([analysis_prompt, image_part])
+            response = self.analysis_model.generate_content([image_part])
             analysis = self._parse_json_response(response.text)
             
             # Store analysis in Firestore
@@ -215,7 +323,7 @@ class HybridArtisanTutor:
                     "multimodal_content": multimodal_content,
                     "estimated_completion_time": f"{lesson.get('difficulty', 1) * 15} minutes"
                 },
-                "progress": self._get_user_progress(user_id),
+                "progress": user_data.get("progress_metrics", {}),
                 "next_actions": self._suggest_next_actions(lesson_id, learning_journey["personalized_curriculum"])
             }
             
@@ -225,7 +333,9 @@ class HybridArtisanTutor:
     def submit_lesson_work(self, user_id: str, lesson_id: str, submission: Dict) -> Dict:
         """Submit and validate lesson work with AI-powered feedback"""
         try:
-            user_doc = firestore_client.collection("users").document(user_id).get()
+            # Read the user once; the helpers below work from this snapshot
+            user_ref = firestore_client.collection("users").document(user_id)
+            user_doc = user_ref.get()
             if not user_doc.exists:
                 return {"status": "error", "message": "User not found"}
             
@@ -241,13 +351,15 @@ class HybridArtisanTutor:
             validation_result = self._validate_submission_with_ai(lesson, submission, user_data)
             
             if validation_result["passed"]:
-                self._update_user_progress(user_id, lesson_id, lesson["points"], validation_result)
+                progress = self._update_user_progress(
+                    user_ref, user_data, lesson_id, lesson["points"], validation_result
+                )
                 new_achievements = self._check_achievement_unlocks(user_id)
                 feedback = self._generate_personalized_feedback(
                     validation_result, 
                     user_data["profile"].get("language", "en")
                 )
-                next_lesson = self._get_next_lesson_recommendation(user_id, lesson_id)
+                next_lesson = self._get_next_lesson_recommendation(user_data, lesson_id)
                 
                 return {
                     "status": "success",
@@ -255,7 +367,7 @@ class HybridArtisanTutor:
                     "feedback": feedback,
                     "points_earned": lesson["points"],
                     "new_achievements": new_achievements,
-                    "progress_update": self._get_user_progress(user_id),
+                    "progress_update": progress,
                     "next_lesson": next_lesson
                 }
             else:
@@ -305,6 +417,15 @@ class HybridArtisanTutor:
         
         lang_code = language_codes.get(language, 'en-IN')
         
+        # Same text + voice -> same object, so repeated strings (welcome
+        # messages, feedback, retry guidance) are synthesized only once
+        digest = hashlib.sha256(f"{text}|{lang_code}".encode("utf-8")).hexdigest()
+        filename = f"audio/{digest}.mp3"
+        audio_url = f"https://storage.googleapis.com/{BUCKET_NAME}/{filename}"
+        blob = storage_client.bucket(BUCKET_NAME).blob(filename)
+        if blob.exists():
+            return audio_url
+        
         synthesis_input = texttospeech.SynthesisInput(text=text)
         voice = texttospeech.VoiceSelectionParams(
             language_code=lang_code,
@@ -320,13 +441,11 @@ class HybridArtisanTutor:
             input=synthesis_input, voice=voice, audio_config=audio_config
         )
         
-        filename = f"audio/{uuid.uuid4()}.mp3"
-        bucket = storage_client.bucket(BUCKET_NAME)
-        blob = bucket.blob(filename)
         blob.upload_from_string(response.audio_content, content_type="audio/mp3")
-        blob.make_public()
+        # No per-object ACL call: the bucket grants allUsers objectViewer
+        # (setup_storage.py), and make_public() is rejected under uniform access
         
-        return f"https://storage.googleapis.com/{BUCKET_NAME}/{filename}"
+        return audio_url
     
     def speech_to_text_multilingual(self, audio_uri: str, language: str = "en") -> str:
         """Convert speech to text in multiple languages"""
@@ -359,7 +478,7 @@ class HybridArtisanTutor:
                 text = text[3:]
             if text.endswith('```'):
                 text = text[:-3]
-            return json.loads(text.strip())
+            return orjson.loads(text.strip())
         except:
             return {}
     
@@ -407,18 +526,12 @@ class HybridArtisanTutor:
     
     def _find_lesson_in_curriculum(self, lesson_id: str, curriculum: Dict) -> Optional[Dict]:
         """Find lesson by ID in curriculum"""
-        curr = curriculum.get("curriculum", PROGRESSIVE_CURRICULUM)
-        for module_key, module_data in curr.items():
-            for lesson in module_data.get("lessons", []):
-                if lesson.get("id") == lesson_id:
-                    return lesson
-        return None
+        located = _locate_lesson(lesson_id, curriculum.get("curriculum", PROGRESSIVE_CURRICULUM))
+        return located[2] if located else None
     
     def _generate_lesson_content(self, lesson: Dict, craft_context: Dict, language: str) -> Dict:
         """Generate personalized lesson content using AI"""
         try:
-            model = GenerativeModel("gemini-2.0-flash-001")
-            
             # Get craft details for personalization
             craft_name = craft_context.get("craft_name", "your craft")
             craft_type = craft_context.get("style", "traditional craft")
@@ -446,8 +559,6 @@ class HybridArtisanTutor:
             
             # Generate detailed lesson instructions
             content_prompt = f"""
-            Create detailed, actionable lesson content for this artisan business lesson:
-            
             LESSON: {lesson.get('title')}
             OBJECTIVE: {lesson.get('objective')}
             DIFFICULTY: {lesson.get('difficulty')}/5
@@ -455,19 +566,16 @@ class HybridArtisanTutor:
             CRAFT CONTEXT:
             {personalized_prompt}
             
-            Provide:
-            1. Clear step-by-step instructions (5-7 steps)
-            2. Practical examples specific to {craft_name}
-            3. Common mistakes to avoid (3 items)
-            4. Success criteria checklist (4 items)
-            5. Pro tips from successful artisans (2 items)
-            
-            Make it culturally relevant, encouraging, and actionable for someone working with {craft_name} from {region}.
-            Keep language simple and practical.
+            The artisan works with {craft_name} from {region}.
             """
             
-            response = model.generate_content(content_prompt)
-            detailed_instructions = response.text
+            cache_key = self._lesson_cache_key(lesson, craft_context, language)
+            detailed_instructions = self._lesson_cache_get(cache_key)
+            if not detailed_instructions:
+                response = self.lesson_model.generate_content(content_prompt)
+                detailed_instructions = response.text
+                if detailed_instructions:
+                    self._lesson_cache_put(cache_key, detailed_instructions)
             
             return {
                 "title": lesson.get("title", ""),
@@ -491,6 +599,54 @@ class HybridArtisanTutor:
                 "craft_context": craft_context
             }
     
+    @staticmethod
+    def _lesson_cache_key(lesson: Dict, craft_context: Dict, language: str) -> str:
+        """The generated instructions depend only on the lesson, the craft context and the language"""
+        canonical = json.dumps(
+            {"lesson": lesson, "craft_context": craft_context, "language": language},
+            sort_keys=True, default=str
+        )
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+    
+    def _lesson_cache_get(self, key: str) -> Optional[str]:
+        """In-process LRU first, then Firestore; None on a miss (or any cache failure)"""
+        with self._lesson_cache_lock:
+            if self._lesson_cache.get(key):
+                self._lesson_cache.move_to_end(key)
+                return self._lesson_cache[key]
+        try:
+            snapshot = firestore_client.collection(LESSON_CACHE_COLLECTION).document(key).get()
+        except Exception:
+            return None
+        if not snapshot.exists:
+            return None
+        data = snapshot.to_dict() or {}
+        expires_at = data.get("expires_at")
+        if expires_at is not None and expires_at <= datetime.now(timezone.utc):
+            return None
+        text = data.get("text")
+        if not text:
+            return None
+        self._lesson_cache_remember(key, text)
+        return text
+    
+    def _lesson_cache_remember(self, key: str, text: str):
+        with self._lesson_cache_lock:
+            self._lesson_cache[key] = text
+            self._lesson_cache.move_to_end(key)
+            while len(self._lesson_cache) > LESSON_CACHE_SIZE:
+                self._lesson_cache.popitem(last=False)
+    
+    def _lesson_cache_put(self, key: str, text: str):
+        """Remember locally now; persist to Firestore in the background"""
+        self._lesson_cache_remember(key, text)
+        now = datetime.now(timezone.utc)
+        future = _cache_writer.submit(
+            firestore_client.collection(LESSON_CACHE_COLLECTION).document(key).set,
+            {"text": text, "created_at": now, "expires_at": now + LESSON_CACHE_TTL}
+        )
+        future.add_done_callback(_log_cache_write_error)
+    
     def _enhance_with_multimodal_elements(self, content: Dict, lesson: Dict,
                                         format: str, language: str, craft_context: Dict) -> Dict:
         """Add multimodal elements"""
@@ -503,14 +659,6 @@ class HybridArtisanTutor:
             "learning_journey.last_active": datetime.now()
         })
     
-    def _get_user_progress(self, user_id: str) -> Dict:
-        """Get user progress"""
-        user_doc = firestore_client.collection("users").document(user_id).get()
-        if user_doc.exists:
-            metrics = user_doc.to_dict().get("progress_metrics", {})
-            return metrics
-        return {}
-    
     def _suggest_next_actions(self, lesson_id: str, curriculum: Dict) -> List[str]:
         """Suggest next actions"""
         return ["Complete the lesson objective", "Submit your work", "Review feedback"]
@@ -533,11 +681,7 @@ class HybridArtisanTutor:
                 }
             
             # Use Gemini to validate the submission
-            model = GenerativeModel("gemini-2.0-flash-001")
-            
             validation_prompt = f"""
-            You are an expert tutor for artisan business education.
-            
             LESSON DETAILS:
             - Title: {lesson.get('title')}
             - Objective: {lesson.get('objective')}
@@ -548,26 +692,10 @@ class HybridArtisanTutor:
             {content}
             
             CRAFT CONTEXT:
-            {json.dumps(user_data.get('profile', {}).get('craft_analysis', {}), indent=2)}
-            
-            Evaluate this submission and return JSON:
-            {{
-                "passed": true/false,
-                "score": 0.0-1.0,
-                "feedback": "Detailed constructive feedback (2-3 sentences)",
-                "strengths": ["strength1", "strength2"],
-                "suggestions": ["improvement1", "improvement2"],
-                "criteria_scores": {{
-                    "criterion1": 0.0-1.0,
-                    "criterion2": 0.0-1.0
-                }}
-            }}
-            
-            Be encouraging but honest. Focus on practical business impact.
-            Pass if score >= 0.7 and meets core objective.
+            {_json_dumps_indented(user_data.get('profile', {}).get('craft_analysis', {}))}
             """
             
-            response = model.generate_content(validation_prompt)
+            response = self.validation_model.generate_content(validation_prompt)
             validation_result = self._parse_json_response(response.text)
             
             # Ensure all required fields exist
@@ -590,49 +718,45 @@ class HybridArtisanTutor:
                 "score": 0.7
             }
     
-    def _update_user_progress(self, user_id: str, lesson_id: str, points: int, validation: Dict):
-        """Update user progress after successful lesson completion"""
+    def _update_user_progress(self, user_ref, user_data: Dict, lesson_id: str, points: int,
+                              validation: Dict) -> Dict:
+        """
+        Update user progress after successful lesson completion
+        user_data is the snapshot read at the start of the request; returns the new progress metrics
+        """
+        user_id = user_ref.id
+        # Safe access to progress metrics
+        current_metrics = user_data.get("progress_metrics") or {}
         try:
-            user_ref = firestore_client.collection("users").document(user_id)
-            user_doc = user_ref.get()
-            
-            if not user_doc.exists:
-                print(f"⚠️ User {user_id} not found for progress update")
-                return
-            
-            user_data = user_doc.to_dict()
-            
-            # Safe access to progress metrics
-            current_metrics = user_data.get("progress_metrics") or {}
-            current_journey = user_data.get("learning_journey") or {}
-            
             # Calculate new values
-            new_total_points = (current_metrics.get("total_points") or 0) + points
-            new_completed = (current_metrics.get("completed_lessons") or 0) + 1
-            new_streak = (current_metrics.get("current_streak") or 0) + 1
-            
-            # Get completed lessons list
-            completed_lessons_list = current_journey.get("completed_lessons") or []
-            if lesson_id not in completed_lessons_list:
-                completed_lessons_list.append(lesson_id)
+            new_metrics = {
+                **current_metrics,
+                "total_points": (current_metrics.get("total_points") or 0) + points,
+                "completed_lessons": (current_metrics.get("completed_lessons") or 0) + 1,
+                "current_streak": (current_metrics.get("current_streak") or 0) + 1
+            }
             
-            # Update Firestore document with all progress fields
+            # Update Firestore document with all progress fields. The snapshot was read
+            # before the (slow) AI validation, so counters and the completed list are
+            # applied server-side rather than overwritten with values computed from it
             user_ref.update({
-                "progress_metrics.total_points": new_total_points,
-                "progress_metrics.completed_lessons": new_completed,
-                "progress_metrics.current_streak": new_streak,
-                "learning_journey.completed_lessons": completed_lessons_list,
+                "progress_metrics.total_points": firestore.Increment(points),
+                "progress_metrics.completed_lessons": firestore.Increment(1),
+                "progress_metrics.current_streak": firestore.Increment(1),
+                "learning_journey.completed_lessons": firestore.ArrayUnion([lesson_id]),
                 "learning_journey.last_active": datetime.now(),
                 "learning_journey.last_completed_lesson": lesson_id,
                 "learning_journey.last_completed_at": datetime.now()
             })
             
-            print(f"✅ Progress updated for {user_id}: +{points} points, {new_completed} lessons completed")
+            print(f"✅ Progress updated for {user_id}: +{points} points, {new_metrics['completed_lessons']} lessons completed")
+            return new_metrics
             
         except Exception as e:
             print(f"❌ Error updating progress: {str(e)}")
             import traceback
             traceback.print_exc()
+            return current_metrics
     
     def _check_achievement_unlocks(self, user_id: str) -> List[Dict]:
         """Check for new achievements"""
@@ -642,32 +766,16 @@ class HybridArtisanTutor:
         """Generate personalized feedback"""
         return validation.get("feedback", "Good work!")
     
-    def _get_next_lesson_recommendation(self, user_id: str, current_lesson_id: str) -> Optional[Dict]:
+    def _get_next_lesson_recommendation(self, user_data: Dict, current_lesson_id: str) -> Optional[Dict]:
         """Get next lesson recommendation based on progress"""
         try:
-            user_doc = firestore_client.collection("users").document(user_id).get()
-            if not user_doc.exists:
-                return None
-            
-            user_data = user_doc.to_dict()
             curriculum = user_data["learning_journey"]["personalized_curriculum"]["curriculum"]
             
             # Find current module and lesson
-            current_module = None
-            current_lesson_idx = None
-            
-            for module_key, module_data in curriculum.items():
-                lessons = module_data.get("lessons", [])
-                for idx, lesson in enumerate(lessons):
-                    if lesson.get("id") == current_lesson_id:
-                        current_module = module_key
-                        current_lesson_idx = idx
-                        break
-                if current_module:
-                    break
-            
-            if not current_module:
+            located = _locate_lesson(current_lesson_id, curriculum)
+            if not located:
                 return None
+            current_module, current_lesson_idx, _ = located
             
             # Get next lesson in same module
             module_lessons = curriculum[current_module].get("lessons", [])
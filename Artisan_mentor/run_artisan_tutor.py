@@ -100,6 +100,8 @@ def _make_client_stub(name):
             return None
         def make_public(self):
             return None
+        def exists(self):
+            return False
 
     class Bucket:
         def __init__(self, name=None):
@@ -17,7 +17,7 @@ sys.path.insert(0, agents_path)
 
 # Import all the agents directly
 from curator_agent import CuratorAgent
-from storyteller_agent import StorytellerAgent
+from storyteller_agent import get_storyteller
 from image_generator_agent import ImageGeneratorAgent
 from synthesizer_agent import ContentSynthesizer
 from pricing_agent import DynamicPricingAgent
@@ -301,7 +301,7 @@ async def generate_storytelling_kit(
             # Initialize storyteller (required)
             print("📖 Loading storyteller agent...")
             try:
-                storyteller = StorytellerAgent()
+                storyteller = get_storyteller()
                 print("✅ Storyteller agent initialized successfully")
             except Exception as e:
                 print(f"❌ Storyteller initialization failed: {str(e)}")
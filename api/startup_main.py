@@ -31,11 +31,11 @@ async def startup_event():
         logger.info("🚀 Initializing agents at startup...")
         
         # Import and initialize agents
-        from storyteller_agent import StorytellerAgent
+        from storyteller_agent import get_storyteller
         from image_generator_agent import ImageGeneratorAgent
         from synthesizer_agent import ContentSynthesizer
         
-        storyteller = StorytellerAgent()
+        storyteller = get_storyteller()
         logger.info("✅ Storyteller initialized")
         
         image_generator = ImageGeneratorAgent()